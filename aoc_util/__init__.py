@@ -1,4 +1,5 @@
-from inspect import stack
+import os
+import sys
 
 #------------------------------------------------------------------------------
 
@@ -12,10 +13,19 @@ def __get_code_file_no_ext():
     current call stack, without the .py extension. If the user is running
     `python day17.py`, this returns `day17`. """
 
-    # Get the bottom frame, grab the filename
-    code_file = stack()[-1].filename
+    # The entry point is the __main__ module, which knows its own filename,
+    # so there's no need to walk the call stack to find it
+    code_file = os.path.basename(__get_code_file_path())
 
     # Remove the code file extension, build and return the input file name.
     code_file_no_header = code_file.replace(PYTHON_FILE_EXT, EMPTY_STRING)
 
     return code_file_no_header
+
+
+def __get_code_file_path():
+    """ Returns the path of the code file that is the entry point into the
+    current call stack (or an empty string in an interactive session). """
+
+    main = sys.modules.get('__main__')
+    return getattr(main, '__file__', None) or sys.argv[0] or EMPTY_STRING
@@ -1,6 +1,18 @@
-from contextlib import ContextDecorator
-from datetime import timedelta
-from time import time
+import os
+import sys
+import tracemalloc
+from contextlib import nullcontext, redirect_stdout
+from copy import deepcopy
+from io import StringIO
+from statistics import median, stdev
+from time import perf_counter_ns
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .input_cache import take_cache_report
 
 #------------------------------------------------------------------------------
 
@@ -8,18 +20,59 @@ AOC_OUTPUT_HEADER = '\nAoC {year} – Day {day}, part {part}'
 
 MICROS_ELAPSED  = 'Ran in {} μs'
 MILLIS_ELAPSED  = 'Ran in {} ms'
-SECONDS_ELAPSED = 'Ran in {}.{} s'
+SECONDS_ELAPSED = 'Ran in {}.{:03d} s'
+
+BENCHMARK_SUMMARY = 'Ran {runs} times (+{warmup} warmup): min {min}, median {median}, p95 {p95}, stddev {stddev}'
+
+# Benchmark mode can be turned on for every solution without touching the code
+# by setting this to the number of timed runs (ex. AOC_BENCHMARK=20), and the
+# number of untimed warmup runs before them can be set with the other.
+BENCHMARK_ENV_VAR = 'AOC_BENCHMARK'
+BENCHMARK_WARMUP_ENV_VAR = 'AOC_BENCHMARK_WARMUP'
+
+DEFAULT_BENCHMARK_RUNS = 20
+DEFAULT_BENCHMARK_WARMUP = 1
+
+PEAK_MEMORY = 'Peak memory: {traced} traced in {blocks:,} blocks, max RSS {rss}'
+TOP_ALLOCATIONS_HEADER = 'Top allocations at peak:'
+TOP_ALLOCATION = '  {size:>10}  {count:>10,} blocks  {location}'
+
+# Memory tracking can be turned on for every solution by setting this (ex.
+# AOC_MEMORY=1), like benchmark mode
+MEMORY_ENV_VAR = 'AOC_MEMORY'
+
+# Number of source lines to list in the top allocations
+MEMORY_TOP_LINES = 5
+
+# While tracking memory, a new snapshot of the allocations is taken whenever
+# the traced memory grows past this multiple of the last snapshot, so that
+# the top allocations are from close to the peak. Snapshots are expensive, so
+# none are taken until this much memory is in use.
+PEAK_SNAPSHOT_GROWTH = 1.5
+MIN_SNAPSHOT_BYTES = 1 << 20
 
 #------------------------------------------------------------------------------
 
-def aoc_output_formatter(year, day, part, label=None, ignore_return_val=False):
+def aoc_output_formatter(year, day, part, label=None, ignore_return_val=False, benchmark=None, memory=None):
     """ Builds a decorator to format the output for a specific AoC solution
     function with niceties like the current day, which problem part it is, and
     an optional meaningful label for the solution's output.
 
     The user can optionally choose to ignore the decorated function's return
     value, which is useful if the problem solution is output by some other
-    means (like being printed to console), not returned by the function. """
+    means (like being printed to console), not returned by the function.
+
+    In benchmark mode the function is run repeatedly, and the spread of its
+    runtimes is reported rather than a single time. `benchmark` can be the
+    number of timed runs, True for the default number, or False to never
+    benchmark. If it isn't set, benchmark mode is controlled by the
+    AOC_BENCHMARK environment variable.
+
+    If `memory` is True (or it isn't set, and the AOC_MEMORY environment
+    variable is), the peak memory of a run and the source lines which
+    allocated the most of it are reported too. Tracking memory slows a run
+    down, so in benchmark mode only the untimed first run is tracked, and
+    otherwise the time reported includes the slowdown. """
 
     header = AOC_OUTPUT_HEADER.format(year=year, day=day, part=part)
     output_format = '{label}: {value}' if label else '{value}'
@@ -29,19 +82,42 @@ def aoc_output_formatter(year, day, part, label=None, ignore_return_val=False):
         a header and builds an output string based on the year, day, part,
         and optional output label passed in above. """
 
-        @__aocTimer()
         def __fn_wrapper(*args):
             """ The decorated function. Is timed using the timer context
-            manager class defined below. """
+            manager class defined below, or benchmarked, with the header and
+            output printed outside of the time measured. """
 
             print(header)
-            value = fn(*args)
+
+            runs, warmup = __get_benchmark_settings(benchmark)
+            tracker = __aocMemoryTracker() if __get_memory_setting(memory) else None
+
+            if runs:
+                value, samples = __benchmark(fn, args, runs, warmup, tracker or nullcontext())
+            else:
+                timer = __aocTimer()
+                with tracker or nullcontext(), timer:
+                    value = fn(*args)
 
             # Only print the output (with value returned from decorated function)
             # if we're not ignoring the return value
             if not ignore_return_val:
                 print(output_format.format(value=value, label=label))
 
+            if runs:
+                __report_benchmark(samples, warmup)
+            else:
+                timer.report()
+
+            if tracker:
+                __report_memory(tracker.peak, tracker.snapshot)
+
+            # Report whether the input was parsed or came from the cache, which
+            # happens before the first part runs, so it isn't in the time above
+            cache_report = take_cache_report()
+            if cache_report:
+                print(cache_report)
+
         # return the decorated function from the decorator
         return __fn_wrapper
 
@@ -49,24 +125,205 @@ def aoc_output_formatter(year, day, part, label=None, ignore_return_val=False):
     return __aoc_formatter_decorator
 
 
-class __aocTimer(ContextDecorator):
-    """ Records the runtime of the decorated function, and prints out a
+class __aocTimer:
+    """ Records the runtime of the code it wraps, and prints out a
     user-friendly representation of the elapsed time. """
 
     def __enter__(self):
-        self.start = time()
+        self.start = perf_counter_ns()
 
     def __exit__(self, *args):
-        elapsed = time() - self.start
-        delta = timedelta(seconds=elapsed)
+        self.elapsed = perf_counter_ns() - self.start
 
-        seconds = delta.seconds
-        millis  = delta.microseconds / 1000
-        micros  = delta.microseconds
+    def report(self):
+        micros = self.elapsed // 1000
+        millis = self.elapsed / 1e6
 
         if millis < 1:
             print(MICROS_ELAPSED.format(micros))
-        elif seconds < 1:
-            print(MILLIS_ELAPSED.format(millis))
+        elif millis < 1000:
+            print(MILLIS_ELAPSED.format(round(millis, 3)))
         else:
-            print(SECONDS_ELAPSED.format(seconds, int(millis)))
\ No newline at end of file
+            print(SECONDS_ELAPSED.format(int(millis // 1000), int(millis % 1000)))
+
+
+class __aocMemoryTracker:
+    """ Tracks the memory allocated by the code it wraps with tracemalloc,
+    recording its peak and a snapshot of the allocations from close to it.
+
+    tracemalloc can only snapshot the allocations which are live right now,
+    so a profile hook watches the traced memory on every function call and
+    return, and takes a new snapshot each time it grows by a good margin. """
+
+    def __enter__(self):
+        self.was_tracing = tracemalloc.is_tracing()
+        if not self.was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        self.baseline, _ = tracemalloc.get_traced_memory()
+        self.snapshot = None
+        self.snapshot_size = self.baseline + MIN_SNAPSHOT_BYTES
+
+        self.previous_profiler = sys.getprofile()
+        sys.setprofile(self.on_profile_event)
+
+    def __exit__(self, *args):
+        sys.setprofile(self.previous_profiler)
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self.snapshot is None or current >= self.snapshot_size:
+            self.snapshot = tracemalloc.take_snapshot()
+
+        self.peak = peak - self.baseline
+        if not self.was_tracing:
+            tracemalloc.stop()
+
+    def on_profile_event(self, frame, event, arg):
+        current, _ = tracemalloc.get_traced_memory()
+        if current >= self.snapshot_size:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current * PEAK_SNAPSHOT_GROWTH
+
+
+def __get_memory_setting(memory):
+    """ Returns whether to track memory, for the decorator's `memory` argument,
+    falling back on the environment variable if it isn't set. """
+
+    if memory is None:
+        return os.environ.get(MEMORY_ENV_VAR, '').strip() not in ('', '0')
+
+    return bool(memory)
+
+
+def __get_max_rss():
+    """ Returns the most memory the process has had resident at once, in
+    bytes, or None where that isn't available. """
+
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports this in KiB, macOS in bytes
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def __get_benchmark_settings(benchmark):
+    """ Returns a tuple of (timed runs, warmup runs) for the decorator's
+    `benchmark` argument, falling back on the environment variables if it
+    isn't set. Zero timed runs means benchmark mode is off. """
+
+    if benchmark is None:
+        setting = os.environ.get(BENCHMARK_ENV_VAR, '').strip()
+        if not setting or setting == '0':
+            return 0, 0
+        benchmark = int(setting) if setting.isdigit() else True
+
+    if benchmark is False:
+        return 0, 0
+
+    runs = DEFAULT_BENCHMARK_RUNS if benchmark is True else benchmark
+    warmup = os.environ.get(BENCHMARK_WARMUP_ENV_VAR, '').strip()
+    warmup = int(warmup) if warmup.isdigit() else DEFAULT_BENCHMARK_WARMUP
+
+    # The first run, whose value and printing are shown, is always a warmup
+    return runs, max(warmup, 1)
+
+
+def __benchmark(fn, args, runs, warmup, tracker):
+    """ Runs the function `warmup` times, then `runs` more times timing each
+    with perf_counter_ns, and returns a tuple of the value it returned and the
+    list of times in ns.
+
+    Every run gets its own deep copy of the arguments, made before its timer
+    starts, since solutions are free to modify their input. Only the first
+    run's own printing is shown, anything printed by later runs is discarded,
+    so the cost of writing to the terminal isn't measured. The first run is
+    also the one wrapped by the memory `tracker`. """
+
+    with tracker:
+        value = fn(*deepcopy(args))
+
+    with redirect_stdout(StringIO()) as discarded:
+        for _ in range(warmup - 1):
+            fn(*deepcopy(args))
+
+        samples = []
+        for _ in range(runs):
+            run_args = deepcopy(args)
+            discarded.seek(0)
+            discarded.truncate()
+
+            start = perf_counter_ns()
+            fn(*run_args)
+            samples.append(perf_counter_ns() - start)
+
+    return value, samples
+
+
+def __report_benchmark(samples, warmup):
+    """ Prints the min, median, 95th percentile and standard deviation of the
+    benchmark's times. """
+
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    print(BENCHMARK_SUMMARY.format(
+        runs=len(samples), warmup=warmup,
+        min=__format_ns(ordered[0]), median=__format_ns(median(ordered)), p95=__format_ns(p95),
+        stddev=__format_ns(stdev(ordered)) if len(ordered) > 1 else '-'))
+
+
+def __report_memory(peak, snapshot):
+    """ Prints the peak memory traced, the process's max RSS, and the source
+    lines which had allocated the most memory as of the snapshot. """
+
+    # Allocations made by tracemalloc itself, or by this module, aren't the
+    # solution's
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    stats = snapshot.statistics('lineno')
+
+    print(PEAK_MEMORY.format(traced=__format_bytes(peak),
+                             blocks=sum(stat.count for stat in stats),
+                             rss=__format_bytes(__get_max_rss())))
+
+    if not stats:
+        return
+
+    print(TOP_ALLOCATIONS_HEADER)
+    for stat in stats[:MEMORY_TOP_LINES]:
+        frame = stat.traceback[0]
+        location = '{}:{}'.format(os.path.relpath(frame.filename), frame.lineno)
+        print(TOP_ALLOCATION.format(size=__format_bytes(stat.size), count=stat.count, location=location))
+
+
+def __format_ns(ns):
+    """ Returns a duration in ns in the most readable unit. """
+
+    if ns < 1e3:
+        return '{:.0f} ns'.format(ns)
+    if ns < 1e6:
+        return '{:.1f} μs'.format(ns / 1e3)
+    if ns < 1e9:
+        return '{:.2f} ms'.format(ns / 1e6)
+
+    return '{:.3f} s'.format(ns / 1e9)
+
+
+def __format_bytes(size):
+    """ Returns a size in bytes in the most readable unit. """
+
+    if size is None:
+        return 'unknown'
+    if size < 1 << 10:
+        return '{} B'.format(size)
+    if size < 1 << 20:
+        return '{:.1f} KiB'.format(size / (1 << 10))
+    if size < 1 << 30:
+        return '{:.1f} MiB'.format(size / (1 << 20))
+
+    return '{:.2f} GiB'.format(size / (1 << 30))
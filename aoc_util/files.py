@@ -0,0 +1,33 @@
+import os
+from contextlib import contextmanager
+
+#------------------------------------------------------------------------------
+
+TEMP_FILE_TEMPLATE = '{path}.{pid}.tmp'
+
+#------------------------------------------------------------------------------
+
+@contextmanager
+def atomic_write(path):
+    """ A context manager which opens a temporary file beside the path for
+    writing bytes, and moves it over the path once the block is done, so a
+    reader (or a crash partway through) never leaves a half written file at
+    the path. If the block raises, the temporary file is removed and the path
+    is left as it was.
+
+    Ex.
+    with atomic_write('inputs/.cache/input_day5.txt.img') as f:
+        f.write(header) """
+
+    temp_path = TEMP_FILE_TEMPLATE.format(path=path, pid=os.getpid())
+
+    try:
+        with open(temp_path, 'wb') as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
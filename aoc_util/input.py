@@ -1,4 +1,16 @@
-from . import __get_code_file_no_ext
+import mmap
+import os
+import warnings
+from contextlib import contextmanager
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import __get_code_file_no_ext, __get_code_file_path
+from .input_cache import cached_parse, transform_identity
+from .program_image import load_program_image
 
 #------------------------------------------------------------------------------
 
@@ -7,19 +19,33 @@ INPUT_FILENAME_TEMPLATE = 'inputs/input_{day_num}.txt'
 # simple placeholder lambda which does nothing
 DO_NOTHING = lambda token: token
 
+# The streaming readers decode the input this many bytes at a time
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+NEWLINE = b'\n'
+WHITESPACE = b' \t\r\n'
+
+# Numbers are parsed into arrays this many bytes of input at a time, to bound
+# the memory needed for the intermediate copies of the text
+ARRAY_CHUNK_SIZE = 1 << 24
+
+# Input file set explicitly with use_input_file(), if any
+__input_filename = None
+
 #------------------------------------------------------------------------------
 
-def get_input():
+def get_input(use_cache=True):
     """ Returns the input for the current AoC day, as a list of raw lines from
-    the input file with newlines removed. """
+    the input file with newlines removed. Unless `use_cache` is False, the
+    lines come from the parsed input cache when the input hasn't changed. """
 
-    input_file = __get_input_filename()
-    input_lines = [x.replace('\n', '') for x in open(input_file).readlines()]
+    if not use_cache:
+        return list(iter_input_lines())
 
-    return input_lines
+    return cached_parse(__get_input_filename(), 'lines', (), lambda: list(iter_input_lines()))
 
 
-def get_tokenized_input(split_str, transform=DO_NOTHING):
+def get_tokenized_input(split_str, transform=DO_NOTHING, use_cache=True):
     """ Returns the input for the current AoC day, where each line is split
     by the supplied string and collected into a list of tokens, and the
     entire input is returned as a list of token lists. Optionally, the caller
@@ -28,20 +54,346 @@ def get_tokenized_input(split_str, transform=DO_NOTHING):
     Ex.
     1,2,3           [['1', '2', '3'],
     4,5,6  ------>   ['4', '5', '6'],
-    7,8,9            ['7', '8', '9']] """
+    7,8,9            ['7', '8', '9']]
+
+    Unless `use_cache` is False, the tokens come from the parsed input cache
+    when neither the input nor the transform has changed (see input_cache). """
+
+    parse = lambda: list(iter_tokenized_input(split_str, transform))
+    if not use_cache:
+        return parse()
+
+    transform_id = transform_identity(transform)
+    params = (split_str, transform_id) if transform_id is not None else None
+
+    return cached_parse(__get_input_filename(), 'tokenized', params, parse)
+
+
+def iter_input_lines(chunk_size=DEFAULT_CHUNK_SIZE):
+    """ A generator for the lines of the input for the current AoC day, with
+    newlines removed, read lazily from a memory-mapped input file. Only about
+    `chunk_size` bytes of the input are decoded at any one time, so an input
+    much bigger than memory can be worked through line by line. """
+
+    for lines in iter_input_chunks(chunk_size):
+        yield from lines
+
+
+def iter_input_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """ A generator for the lines of the input for the current AoC day, in
+    lists of consecutive lines making up roughly `chunk_size` bytes of the
+    input each, for callers that work through the input in batches. A single
+    line longer than `chunk_size` comes in a list of its own. """
+
+    with open_input() as data:
+        if not len(data):
+            return
+
+        # A newline at the very end doesn't start another line
+        size = len(data)
+        if data[size-1:size] == NEWLINE:
+            size -= 1
+
+        position = 0
+        while True:
+
+            # Cut the chunk at the last newline in it, or if there isn't one,
+            # at the end of the line that runs past it
+            limit = position + chunk_size
+            if limit < size:
+                end = data.rfind(NEWLINE, position, limit)
+                if end == -1:
+                    end = data.find(NEWLINE, limit, size)
+                if end == -1:
+                    end = size
+            else:
+                end = size
+
+            yield data[position:end].decode().split('\n')
+
+            if end == size:
+                break
+            position = end + 1
+
+
+def iter_tokenized_input(split_str, transform=DO_NOTHING, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ A generator for the lines of the input for the current AoC day, each
+    split by the supplied string into a list of tokens, and each token
+    transformed by the optional `transform` as the line is reached (see
+    get_tokenized_input). """
+
+    for line in iter_input_lines(chunk_size):
+        yield [transform(t) for t in line.split(split_str)]
+
+
+def iter_input_tokens(split_str, transform=DO_NOTHING, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ A generator for every token in the input for the current AoC day, in
+    order, where tokens are separated by the supplied string or by newlines.
+    Empty lines are skipped. Each token is transformed by the optional
+    `transform` as it's reached.
+
+    Unlike iter_tokenized_input(), a line is never read in whole, so this can
+    stream an input which is one enormous line (ex. an Intcode program).
+
+    Ex.
+    1,2,3
+    4,5,6  ------>  '1', '2', '3', '4', '5', '6', '7', '8', '9'
+    7,8,9 """
+
+    separator = split_str.encode()
+
+    with open_input() as data:
+
+        # Whether the last chunk was cut at a separator, partway through a line
+        mid_line = False
+
+        position = 0
+        while position < len(data):
+
+            # Cut the chunk at the last separator or newline in it, so that no
+            # token is split across two chunks
+            end = __find_cut(data, separator, position, position + chunk_size)
+            cut_at_separator = data[end:end+len(separator)] == separator
+
+            # Only a whole line with nothing in it is skipped, an empty piece of
+            # a line on either side of a cut is an empty token
+            lines = data[position:end].decode().split('\n')
+            for i, line in enumerate(lines):
+                whole_line = (i > 0 or not mid_line) and (i < len(lines) - 1 or not cut_at_separator)
+                if line or not whole_line:
+                    yield from map(transform, line.split(split_str))
+
+            mid_line = cut_at_separator
+            position = end + (len(separator) if cut_at_separator else 1)
+
+        # A separator right at the end of the input still ends a token
+        if mid_line:
+            yield transform('')
+
+
+def read_ints(sep=',', dtype='int64', use_cache=True, chunk_size=ARRAY_CHUNK_SIZE):
+    """ Returns every integer in the input for the current AoC day as a 1-D
+    NumPy array, where the integers are separated by the supplied string
+    and/or whitespace (including newlines). Pass a `sep` of None for integers
+    separated by whitespace alone.
+
+    The text is parsed in bulk by NumPy, rather than an int() per token.
+    Unless `use_cache` is False, the array comes from the parsed input cache
+    when the input hasn't changed. A value too big for `dtype` raises an
+    OverflowError, and anything which isn't an integer raises a ValueError.
+
+    Ex.
+    1,2,3
+    4,5,6  ------>  array([1, 2, 3, 4, 5, 6, 7, 8, 9]) """
+
+    __require_numpy()
+    dtype = np.dtype(dtype)
+
+    parse = lambda: __parse_ints(sep, dtype, chunk_size)
+    if not use_cache:
+        return parse()
+
+    return cached_parse(__get_input_filename(), 'ints', (sep, dtype.str), parse)
+
+
+def read_int_matrix(sep=None, dtype='int64', use_cache=True):
+    """ Returns the input for the current AoC day as a 2-D NumPy array, with
+    a row for each (non-empty) line, where the integers in a line are
+    separated by the supplied string and/or whitespace. Raises a ValueError if
+    the integers can't be split into rows as wide as the first line.
+
+    Ex.
+    1 2 3            array([[1, 2, 3],
+    4 5 6  ------>          [4, 5, 6],
+    7 8 9                   [7, 8, 9]]) """
 
-    tokenized   = [line.split(split_str) for line in get_input()]
-    transformed = [[transform(t) for t in line] for line in tokenized]
+    values = read_ints(sep, dtype, use_cache)
 
-    return transformed
+    # The width of the matrix is the number of integers in the first line
+    first_line = next((line for line in iter_input_lines() if line.strip()), '')
+    separator = sep if sep is not None else ' '
+    columns = len(first_line.replace(separator, ' ').split())
+
+    if not columns or len(values) % columns:
+        raise ValueError('the lines of the input don\'t all hold the same number of integers')
+
+    return values.reshape(-1, columns)
+
+
+def read_digits(use_cache=True):
+    """ Returns every digit in the input for the current AoC day, with any
+    whitespace (including newlines) skipped, as a 1-D NumPy array of uint8.
+    Raises a ValueError if the input holds anything but digits and whitespace.
+
+    Ex.
+    123456789012  ------>  array([1, 2, 3, 4, 5, 6, 7, 8, 9, 0, 1, 2]) """
+
+    __require_numpy()
+
+    def parse():
+        with open_input() as data:
+            text = bytes(data).translate(None, WHITESPACE)
+
+        # Anything below '0' wraps around, so one comparison checks both ends
+        digits = np.frombuffer(text, dtype=np.uint8) - ord('0')
+        if (digits > 9).any():
+            raise ValueError('the input holds something other than digits')
+
+        return digits
+
+    if not use_cache:
+        return parse()
+
+    return cached_parse(__get_input_filename(), 'digits', (), parse)
+
+
+def __parse_ints(sep, dtype, chunk_size):
+    """ Parses every integer in the input into an array, `chunk_size` bytes of
+    input at a time, with each chunk cut just after a separator so no integer
+    is split across two chunks (see read_ints). """
+
+    separator = sep.encode() if sep is not None else b' '
+    limits = np.iinfo(dtype)
+    arrays = []
+
+    with open_input() as data:
+        position = 0
+        while position < len(data):
+            end = __find_cut(data, separator, position, position + chunk_size)
+
+            text = data[position:end]
+            if sep is not None:
+                text = text.replace(separator, b' ')
+
+            # NumPy parses a chunk of nothing but whitespace as a 0
+            position = end + (len(separator) if data[end:end+len(separator)] == separator else 1)
+            if not text.strip():
+                continue
+
+            # NumPy only warns when it stops at something it can't parse
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                try:
+                    chunk = np.fromstring(text, dtype=dtype, sep=' ')
+                except (ValueError, DeprecationWarning):
+                    raise ValueError('the input holds something other than integers') from None
+
+            # NumPy clamps a value too big for the dtype to its limit, rather
+            # than failing, so any value at a limit is checked against its text
+            at_limits = np.flatnonzero((chunk == limits.min) | (chunk == limits.max))
+            if len(at_limits):
+                tokens = text.split()
+                for i in at_limits:
+                    if int(tokens[i]) != int(chunk[i]):
+                        raise OverflowError('the input holds an integer too big for {}'.format(dtype))
+
+            arrays.append(chunk)
+
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+
+def __find_cut(data, separator, position, limit):
+    """ Returns where to cut the chunk of the input which starts at
+    `position`, the start of a token: at the last separator or newline before
+    `limit`, or if there isn't one, the first one after it, or else the end
+    of the input.
+
+    A separator is matched from the left without overlaps, as str.split()
+    does, so a separator which can overlap itself (ex. ',,' in '1,,,2') isn't
+    a place to cut everywhere it's found. For one of those, the line the
+    limit falls in is scanned forward from its start instead. """
+
+    size = len(data)
+    if limit >= size:
+        return size
+
+    line_end = data.rfind(NEWLINE, position, limit)
+
+    if not any(separator[:i] == separator[-i:] for i in range(1, len(separator))):
+        end = max(data.rfind(separator, position, limit), line_end)
+        if end == -1:
+            ends = [e for e in (data.find(separator, limit), data.find(NEWLINE, limit)) if e != -1]
+            end = min(ends) if ends else size
+        return end
+
+    start = line_end + 1 if line_end != -1 else position
+    next_line = data.find(NEWLINE, start)
+    if next_line == -1:
+        next_line = size
+
+    end = line_end
+    while True:
+        found = data.find(separator, start, next_line)
+        if found == -1 or (found >= limit and end != -1):
+            break
+        end = found
+        if found >= limit:
+            break
+        start = found + len(separator)
+
+    return end if end != -1 else next_line
+
+
+def __require_numpy():
+    """ Raises an ImportError if NumPy isn't installed. """
+
+    if np is None:
+        raise ImportError('reading the input into arrays needs NumPy, which isn\'t installed')
+
+
+@contextmanager
+def open_input(path=None):
+    """ A context manager which memory-maps the input file for the current AoC
+    day (or the file at the path, if provided), read only, and closes the
+    mapping and the file when done. An empty file is given as empty bytes,
+    since an empty file can't be mapped.
+
+    Ex.
+    with open_input() as data:
+        num_lines = data.count(b'\n') """
+
+    with open(path or __get_input_filename(), 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b''
+            return
+
+        with data:
+            yield data
+
+
+def get_program_image():
+    """ Returns the input for the current AoC day as a ProgramImage, for days
+    where the input is a comma-separated Intcode program. The program is only
+    parsed the first time, after that it's memory-mapped from a binary cache.
+
+    Ex.
+    1,0,0,3,99  -->  get_program_image().as_list() == [1, 0, 0, 3, 99] """
+
+    return load_program_image(__get_input_filename())
+
+
+def use_input_file(path):
+    """ Sets the input file to read from, rather than working it out from the
+    code file being run (ex. for running a day's code from somewhere else).
+    Passing None goes back to working it out. """
+
+    global __input_filename
+    __input_filename = path
 
 
 def __get_input_filename():
     """ Returns the input filename based on the context of the calling
-    code file.
+    code file, relative to the directory the code file is in, unless one was
+    set with use_input_file().
     
     Ex.
     day3.py  --> input_day3.txt
     day14.py --> input_day4.txt """
 
-    return INPUT_FILENAME_TEMPLATE.format(day_num=__get_code_file_no_ext())
+    if __input_filename is not None:
+        return __input_filename
+
+    input_file = INPUT_FILENAME_TEMPLATE.format(day_num=__get_code_file_no_ext())
+    return os.path.join(os.path.dirname(__get_code_file_path()), input_file)
@@ -0,0 +1,221 @@
+import builtins
+import os
+import pickle
+from hashlib import sha256
+from inspect import isbuiltin
+from time import perf_counter_ns
+from types import CodeType, FunctionType, ModuleType
+
+from .files import atomic_write
+
+#------------------------------------------------------------------------------
+
+# Where parsed inputs are cached, relative to the input file
+CACHE_DIR = '.cache'
+
+PICKLE_FILE_EXT = '.pickle'
+NPY_FILE_EXT = '.npy'
+
+# Bump this to orphan every cached input, if the way they're parsed changes
+CACHE_VERSION = 1
+
+# Globals of these types, referenced by a transform, are identified by value
+CONSTANT_TYPES = (bool, int, float, complex, str, bytes, type(None))
+
+# Cache lookups since the last report, for the timing output
+__stats = {'hits': 0, 'misses': 0, 'ns': 0}
+
+#------------------------------------------------------------------------------
+
+def cached_parse(path, kind, params, parse):
+    """ Returns the parsed contents of the input file at the path, from the
+    on-disk cache if it holds a parse of the file as it is now, otherwise by
+    calling `parse()` and caching the result.
+
+    A cached parse is keyed by the input's path, mtime and size, `kind` (what
+    the input was parsed into), and `params` (ex. the separator and transform
+    used), so a change to any of them misses the cache. A params of None means
+    the parse can't be identified (see transform_identity), and it isn't
+    cached at all.
+
+    A numpy array is cached as a .npy file, anything else is pickled. """
+
+    if params is None:
+        return parse()
+
+    started = perf_counter_ns()
+
+    # The cache file is named for the parse, then for the state of the input,
+    # so a new parse of a changed input can clear out the stale one
+    stat = os.stat(path)
+    parse_key = __digest((CACHE_VERSION, kind, params))
+    input_key = __digest((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    cache_path = __get_cache_path(path, kind, parse_key, input_key)
+
+    value = __read_cached(cache_path)
+    if value is not None:
+        __record('hits', started)
+        return value[0]
+
+    value = parse()
+    __write_cached(cache_path, value)
+    __record('misses', started)
+
+    return value
+
+
+def transform_identity(transform):
+    """ Returns a string identifying what a transform does, to key the cache
+    by, or None if it can't be identified.
+
+    Types and builtins (ex. int) always do the same thing, so they're
+    identified by name. A Python function is identified by its name, its
+    code, its defaults, and the identity of every global or builtin its code
+    references, recursively through any functions it calls, so swapping
+    `int(t)` for `float(t)` misses the cache. A function which closes over
+    variables, or references a global which isn't a function, type, module or
+    plain constant, can't be identified, since its value may change, and
+    neither can a callable object without code. """
+
+    return __identify(transform, set())
+
+
+def __identify(value, seen):
+    """ Returns a string identifying the value, for transform_identity, or
+    None if it can't be identified. `seen` holds the ids of the functions
+    being identified further up, so recursion ends. """
+
+    name = '{}.{}'.format(getattr(value, '__module__', None), getattr(value, '__qualname__', None))
+
+    if isinstance(value, type) or isbuiltin(value):
+        return name
+    if isinstance(value, ModuleType):
+        return 'module {}'.format(value.__name__)
+    if isinstance(value, CONSTANT_TYPES):
+        return repr(value)
+    if not isinstance(value, FunctionType) or value.__closure__:
+        return None
+
+    if id(value) in seen:
+        return name
+    seen.add(id(value))
+
+    parts = [name, repr(value.__defaults__), repr(value.__kwdefaults__)]
+    namespaces = (value.__globals__, vars(builtins))
+
+    for code in __iter_code(value.__code__):
+        parts += [code.co_code.hex(), repr(code.co_names),
+                  repr([const for const in code.co_consts if not isinstance(const, CodeType)])]
+
+        # co_names also holds attribute names, which are only looked up here
+        # in case they shadow a global
+        for referenced in code.co_names:
+            for namespace in namespaces:
+                if referenced in namespace:
+                    identity = __identify(namespace[referenced], seen)
+                    if identity is None:
+                        return None
+                    parts.append('{}={}'.format(referenced, identity))
+                    break
+
+    return '{}:{}'.format(name, sha256('\n'.join(parts).encode()).hexdigest()[:16])
+
+
+def __iter_code(code):
+    """ Yields the code object, and every code object nested in it (ex. the
+    code of a lambda defined inside a function). """
+
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from __iter_code(const)
+
+
+def take_cache_report():
+    """ Returns a summary of the cache lookups made since the last report, or
+    None if there weren't any, and starts counting again. """
+
+    hits, misses, elapsed = __stats['hits'], __stats['misses'], __stats['ns']
+    if not hits and not misses:
+        return None
+
+    __stats.update(hits=0, misses=0, ns=0)
+
+    return 'Input cache: {} hit{}, {} miss{} ({:.1f} ms)'.format(
+        hits, '' if hits == 1 else 's', misses, '' if misses == 1 else 'es', elapsed / 1e6)
+
+
+def __record(outcome, started):
+    """ Counts a cache lookup, and the time it took. """
+
+    __stats[outcome] += 1
+    __stats['ns'] += perf_counter_ns() - started
+
+
+def __get_cache_path(path, kind, parse_key, input_key):
+    """ Returns the path of a cached parse of the input file at the path,
+    without an extension.
+
+    Ex.
+    inputs/input_day1.txt  -->  inputs/.cache/input_day1.txt.lines.0f3a9c0e.1b2d4a5c """
+
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR, '{}.{}.{}.{}'.format(filename, kind, parse_key, input_key))
+
+
+def __digest(key):
+    """ Returns a short hex digest of the repr of the key. """
+
+    return sha256(repr(key).encode()).hexdigest()[:8]
+
+
+def __read_cached(cache_path):
+    """ Returns a tuple holding the value cached at the path, or None if there
+    isn't a readable one there. """
+
+    try:
+        with open(cache_path + PICKLE_FILE_EXT, 'rb') as f:
+            return (pickle.load(f),)
+    except FileNotFoundError:
+        pass
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+    if not os.path.exists(cache_path + NPY_FILE_EXT):
+        return None
+
+    try:
+        import numpy as np
+        return (np.load(cache_path + NPY_FILE_EXT, allow_pickle=False),)
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def __write_cached(cache_path, value):
+    """ Caches the value at the path, through a temporary file, so a reader
+    never sees a half written value. Cached parses of older versions of the
+    same input, parsed the same way, are removed. """
+
+    directory, prefix = os.path.split(cache_path)
+    prefix = prefix.rsplit('.', 1)[0] + '.'
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith(prefix):
+                os.remove(os.path.join(directory, name))
+    except OSError:
+        return
+
+    is_array = type(value).__module__ == 'numpy' and type(value).__name__ == 'ndarray'
+    final_path = cache_path + (NPY_FILE_EXT if is_array else PICKLE_FILE_EXT)
+
+    try:
+        with atomic_write(final_path) as f:
+            if is_array:
+                import numpy as np
+                np.save(f, value, allow_pickle=False)
+            else:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except (OSError, ValueError, pickle.PicklingError):
+        pass
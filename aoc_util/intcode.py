@@ -1,10 +1,78 @@
 
+from functools import lru_cache
+from time import monotonic, perf_counter_ns
+
+from .intcode_memory import ListMemory, promote
+from .intcode_ports import IntcodePort, SinkPort, as_port
+from .intcode_profiler import IntcodeProfile
+from .program_image import ProgramImage
+
+#------------------------------------------------------------------------------
+
+# Default number of distinct inputs an IntcodeRunCache remembers results for
+DEFAULT_RUN_CACHE_SIZE = 4096
+
+# When executing against a deadline, the clock is checked this often (in
+# instructions) rather than on every instruction.
+DEADLINE_CHECK_INTERVAL = 1000
+
+#------------------------------------------------------------------------------
+
 class InputNotAvailableException(BaseException):
     """ An exception to indicate that an IntcodeComputer is attempting to read
     input but none is available. """
     pass
 
 
+class IntcodeSnapshot:
+    """ A frozen copy of an Intcode computer's state, which can be forked into
+    new computers which continue from that state independently. """
+
+    def __init__(self, computer):
+        """ Captures the state of the provided computer. """
+
+        self.computer_class = type(computer)
+        self.memory_backend = computer.memory_backend
+
+        # Slicing copies the memory in whichever form the backend keeps it
+        self.program = computer.program[:]
+        self.instruction_ptr = computer.instruction_ptr
+        self.state = computer.state
+
+        self.program_input = list(computer.program_input or ())
+        self.output_buffer = list(computer.output_buffer)
+
+
+    def fork(self, memory_patches=None, computer=None):
+        """ Returns a new computer in the captured state, with its own copy of
+        the memory. Optionally, values in the copied memory can be overridden
+        with a dict of address to value.
+
+        Optionally, an existing computer (ex. one from an IntcodeComputerPool)
+        can be put into the captured state instead, reusing its memory. """
+
+        if computer is None:
+            computer = self.computer_class()
+            computer.memory_backend = self.memory_backend
+            computer.program = self.program[:]
+        else:
+            computer.memory_backend = self.memory_backend
+            computer.program = self.memory_backend.overwrite(computer.program, self.program)
+            computer.clear_decode_cache()
+
+        computer.instruction_ptr = self.instruction_ptr
+        computer.state = self.state
+
+        computer.program_input = IntcodePort(self.program_input)
+        computer.output_buffer = IntcodePort(self.output_buffer)
+
+        if memory_patches:
+            for address, value in memory_patches.items():
+                computer.program[address] = value
+
+        return computer
+
+
 class IntcodeComputer:
     """ A computer than can execute arbitrary Intcode programs.
 
@@ -26,12 +94,28 @@ class IntcodeComputer:
     OPCODE_EQUALS = 8   # 8, <param1>, <param2>, <destination>
     OPCODE_HALT   = 99
 
+    # Superinstructions, which are never decoded from memory. Each is an ADD,
+    # MULT, LESS or EQUALS fused with the JIT or JIF after it which tests the
+    # value it wrote (see fuse_instruction).
+    OPCODE_ADD_JUMP    = 101  # <param1>, <param2>, <destination>, <jump if true>, <target>
+    OPCODE_MULT_JUMP   = 102  # <param1>, <param2>, <destination>, <jump if true>, <target>
+    OPCODE_LESS_JUMP   = 107  # <param1>, <param2>, <destination>, <jump if true>, <target>
+    OPCODE_EQUALS_JUMP = 108  # <param1>, <param2>, <destination>, <jump if true>, <target>
+
     PARAM_MODE_POSITION  = 0
     PARAM_MODE_IMMEDIATE = 1
 
+    # A raw opcode is at most 5 digits, ABCDE (see get_opcode_and_param_modes)
+    MAX_RAW_OPCODE = 99999
+
     STATE_INIT    = 'init'     # computer initialized, not yet running
     STATE_RUNNING = 'running'  # computer actively running program
     STATE_WAITING = 'waiting'  # computer needs input that isn't yet available
+    STATE_SUSPENDED = 'suspended'  # computer ran out of budget, and can resume
+
+    EVENT_NEED_INPUT = 'need_input'  # program needs an input value sent to it
+    EVENT_OUTPUT     = 'output'      # program wrote a value to output
+    EVENT_PAUSE      = 'pause'       # program paused to let others run
 
     OPCODE_NUM_PARAMS_MAP = {
         OPCODE_ADD:    3,
@@ -44,71 +128,491 @@ class IntcodeComputer:
         OPCODE_EQUALS: 3,
     }
 
+    FUSED_OPCODE_MAP = {
+        OPCODE_ADD:    OPCODE_ADD_JUMP,
+        OPCODE_MULT:   OPCODE_MULT_JUMP,
+        OPCODE_LESS:   OPCODE_LESS_JUMP,
+        OPCODE_EQUALS: OPCODE_EQUALS_JUMP,
+    }
+
+    # Whether decoding fuses instructions into superinstructions. A computer
+    # which needs to see every instruction separately turns this off.
+    FUSE_INSTRUCTIONS = True
+
+    # The method which carries out each opcode. This is looked up by name
+    # when an instruction is decoded, so a subclass can override a handler,
+    # and a new computer doesn't have to build a table of its own.
+    OPCODE_HANDLERS = {
+        OPCODE_ADD:    'enact_add',
+        OPCODE_MULT:   'enact_mult',
+        OPCODE_INPUT:  'enact_input',
+        OPCODE_OUTPUT: 'enact_output',
+        OPCODE_JIT:    'enact_jit',
+        OPCODE_JIF:    'enact_jif',
+        OPCODE_LESS:   'enact_less_than',
+        OPCODE_EQUALS: 'enact_equals',
+
+        OPCODE_ADD_JUMP:    'enact_add_jump',
+        OPCODE_MULT_JUMP:   'enact_mult_jump',
+        OPCODE_LESS_JUMP:   'enact_less_than_jump',
+        OPCODE_EQUALS_JUMP: 'enact_equals_jump',
+    }
 
-    def __init__(self):
+
+    def __init__(self, memory_backend=ListMemory):
         """ Initializes an Intcode computer. Sets the instruction pointer to
-        address 0, and establishes some maps defining which action to take for
-        any given opcode. """
+        address 0. Programs are loaded into memory by `memory_backend` (see
+        intcode_memory). """
+
+        self.memory_backend = memory_backend
+        self.program = None
 
-        self.output_buffer = list()
+        self.output_buffer = IntcodePort()
+        self.program_input = IntcodePort()
         self.instruction_ptr = 0
 
+        # The ports the computer made for itself, which reset() clears and
+        # reuses, unlike ports wired in from other computers
+        self.own_ports = (self.program_input, self.output_buffer)
+
         self.state = IntcodeComputer.STATE_INIT
 
-        self.opcode_map = {
-            IntcodeComputer.OPCODE_ADD:    self.enact_add,
-            IntcodeComputer.OPCODE_MULT:   self.enact_mult,
-            IntcodeComputer.OPCODE_INPUT:  self.enact_input,
-            IntcodeComputer.OPCODE_OUTPUT: self.enact_output,
-            IntcodeComputer.OPCODE_JIT:    self.enact_jit,
-            IntcodeComputer.OPCODE_JIF:    self.enact_jif,
-            IntcodeComputer.OPCODE_LESS:   self.enact_less_than,
-            IntcodeComputer.OPCODE_EQUALS: self.enact_equals,
-        }
-
-
-    def execute(self, program, program_input=None):
-        """ Executes the provided program with the specified input. """
-
-        # If the computer is currently waiting, that means it was previously
-        # running. We only want to update the input to utilize the new input,
-        # we don't want to mess with the program state (memory), we want to
-        # continue running with the previous state of the memory
-        if self.state == IntcodeComputer.STATE_WAITING:
-            self.program_input = program_input
+        # Decoded instructions keyed by address, and a map of each memory
+        # address to the addresses of the cached instructions which cover it,
+        # so a write into an instruction can drop its stale decoding.
+        self.decode_cache = dict()
+        self.decode_cache_owners = dict()
 
-        # If the computer isn't waiting, this is a fresh execution.
-        # Store the program into memory, and the new input
-        else:
-            self.program = program
+        # Execution profile being collected, if profiling is enabled
+        self.profile = None
+
+
+    def reset(self, program, program_input=None):
+        """ Puts the computer back the way it was when it was created, with a
+        fresh copy of the program in memory, ready to be executed with
+        `execute(None)`. Returns the computer.
+
+        The memory the computer already has is reused rather than allocated
+        again, with the program copied straight over it, so a computer can be
+        used for any number of runs without the churn of building a new one
+        for each. The program can be a list, an array or a ProgramImage, and is
+        never used as the memory itself, so one program can seed any number of
+        computers.
+
+        The same goes for the ports the computer made itself, which are
+        emptied rather than replaced. A port which was wired in from another
+        computer is left to that computer, and replaced with a new one. """
+
+        self.reload(program)
+
+        own_input, own_output = self.own_ports
+
+        if isinstance(program_input, (IntcodePort, SinkPort)):
             self.program_input = program_input
+        else:
+            if self.program_input is own_input:
+                own_input.clear()
+            else:
+                own_input = IntcodePort()
+            if program_input:
+                own_input.write_many(program_input)
+            self.program_input = own_input
+
+        if self.output_buffer is own_output:
+            own_output.clear()
+        else:
+            self.output_buffer = own_output = IntcodePort()
+
+        self.own_ports = (own_input, own_output)
+
+        return self
+
+
+    def reload(self, program):
+        """ Puts a fresh copy of the program in memory, ready to be executed
+        with `execute(None)`, like reset() does, but leaves the input and
+        output ports as they are (ex. when they're already wired to other
+        computers). Returns the computer. """
+
+        if isinstance(program, ProgramImage):
+            program = program.view if program.mapping is not None else program.values
+
+        self.program = self.memory_backend.overwrite(self.program, program)
+        self.instruction_ptr = 0
+        self.state = IntcodeComputer.STATE_INIT
+        self.clear_decode_cache()
+
+        return self
+
+
+    def execute(self, program, program_input=None, max_instructions=None, deadline=None):
+        """ Executes the provided program with the specified input. Output is
+        collected into the output buffer. If the program needs input that isn't
+        available, an InputNotAvailableException is raised, and the computer
+        picks up where it left off when executed again with more input.
+
+        Optionally, the execution can be given a budget of `max_instructions`
+        (a fused superinstruction counts as one), and/or a `deadline` as a
+        time.monotonic() time. A computer which runs out of budget stops in
+        STATE_SUSPENDED, and picks up where it left off when executed again. """
+
+        # If the computer is currently waiting or suspended, that means it was
+        # previously running. We only want to update the input to utilize the
+        # new input, we don't want to mess with the program state (memory), we
+        # want to continue running with the previous state of the memory
+        if self.state in (IntcodeComputer.STATE_WAITING, IntcodeComputer.STATE_SUSPENDED):
+            program = None
+
+        # Without a budget, just run until the program halts or needs input
+        if max_instructions is None and deadline is None:
+            self.drain(self.run(program, program_input))
+            return
+
+        if max_instructions is not None and max_instructions < 1:
+            raise ValueError('max_instructions must be at least 1')
+
+        # Run in slices, pausing to check the budget after each one. A slice
+        # never runs past the instruction budget, so the budget is exact.
+        remaining = max_instructions
+        while True:
+            slice_size = DEADLINE_CHECK_INTERVAL if deadline is not None else remaining
+            if remaining is not None:
+                slice_size = min(slice_size, remaining)
+
+            if not self.drain(self.run(program, program_input, pause_every=slice_size)):
+                return
+            program, program_input = None, None
+
+            if remaining is not None:
+                remaining -= slice_size
+            if remaining == 0 or (deadline is not None and monotonic() >= deadline):
+                self.state = IntcodeComputer.STATE_SUSPENDED
+                return
+
+
+    def drain(self, runner):
+        """ Runs a generator from run() until the program halts, pauses, or
+        needs input, collecting output into the output buffer. Returns whether
+        the program paused. If the program needs input, an
+        InputNotAvailableException is raised. """
+
+        for event, value in runner:
+            if event == IntcodeComputer.EVENT_OUTPUT:
+                self.output_buffer.write(value)
+            elif event == IntcodeComputer.EVENT_NEED_INPUT:
+                raise InputNotAvailableException()
+            elif event == IntcodeComputer.EVENT_PAUSE:
+                return True
+
+        return False
+
+
+    def run(self, program=None, program_input=None, pause_every=None):
+        """ Returns a generator which executes a program, yielding an event
+        tuple of the form (event, value) whenever the program has to interact
+        with the outside world:
+
+        (EVENT_OUTPUT, value)    - the program wrote the value to output
+        (EVENT_NEED_INPUT, None) - the program needs input, resume it by
+                                   calling send() with the input value
+        (EVENT_PAUSE, None)      - the program has run another `pause_every`
+                                   instructions, if set, so others can run
+
+        Input in `program_input` is used up before asking for more. If no
+        program is provided, the computer resumes from wherever it stopped.
+
+        If profiling is enabled, the program runs in a separate loop which
+        records every instruction, so the usual loop pays nothing for it. """
+
+        if self.profile is not None:
+            return self.run_profiled(program, program_input, pause_every)
+
+        return self.run_unprofiled(program, program_input, pause_every)
+
+
+    def load(self, program, program_input):
+        """ Prepares to run. A new program is a fresh execution, so store the
+        program into memory, and the new input, and forget any instructions
+        decoded from a previous program. Otherwise just take the new input. """
+
+        if program is not None:
+            self.program = self.memory_backend.load(program)
+            self.program_input = as_port(program_input)
+            self.clear_decode_cache()
+        elif program_input is not None:
+            self.program_input = as_port(program_input)
 
         # Whether the previous state was init or waiting, now it's running
         self.state = IntcodeComputer.STATE_RUNNING
 
-        # Retrieve the first opcode and param modes
-        opcode, modes = self.get_opcode_and_param_modes()
+
+    def run_unprofiled(self, program=None, program_input=None, pause_every=None):
+        """ The generator behind run(), when profiling is disabled. """
+
+        self.load(program, program_input)
+
+        decode_cache = self.decode_cache
+
+        # Count down the instructions until the next pause. Without a pause
+        # interval, the countdown starts negative and never reaches zero.
+        countdown = pause_every or -1
+
+        # Retrieve the first decoded instruction
+        opcode, handler, params, width = (decode_cache.get(self.instruction_ptr)
+                                          or self.decode_instruction())
 
         # Continue until we find the HALT opcode
         while opcode != IntcodeComputer.OPCODE_HALT:
 
-            try:
-                # Execute the current opcode
-                skip_advance_instruction_ptr = self.execute_instruction(opcode, modes)
-
-            except InputNotAvailableException:
-                self.state = IntcodeComputer.STATE_WAITING
-                raise
+            # Input and output are handled here rather than by their handlers,
+            # since they may need to hand control back to the caller
+            if opcode == IntcodeComputer.OPCODE_INPUT:
+                if self.program_input:
+                    input_value = self.program_input.read()
+                else:
+                    self.state = IntcodeComputer.STATE_WAITING
+                    input_value = yield IntcodeComputer.EVENT_NEED_INPUT, None
+                    while input_value is None:
+                        input_value = yield IntcodeComputer.EVENT_NEED_INPUT, None
+                    self.state = IntcodeComputer.STATE_RUNNING
+
+                self.write_memory(params[0][0], input_value)
+                self.instruction_ptr += width
+
+            elif opcode == IntcodeComputer.OPCODE_OUTPUT:
+                output_value = self.determine_param_value(*params[0])
+                self.instruction_ptr += width
+                yield IntcodeComputer.EVENT_OUTPUT, output_value
 
             # If the instruction just executed modified the instruction pointer
             # directly, skip advancing the instruction pointer
-            if not skip_advance_instruction_ptr:
-                # Advance the instruction pointer by the number of parameters used
-                # by the previous instruction
-                self.instruction_ptr += IntcodeComputer.OPCODE_NUM_PARAMS_MAP[opcode] + 1
+            elif not handler(*params):
+                # Advance the instruction pointer past the previous instruction
+                self.instruction_ptr += width
+
+            countdown -= 1
+            if not countdown:
+                countdown = pause_every
+                yield IntcodeComputer.EVENT_PAUSE, None
+
+            # Retrieve the next decoded instruction
+            opcode, handler, params, width = (decode_cache.get(self.instruction_ptr)
+                                              or self.decode_instruction())
+
+
+    def run_profiled(self, program=None, program_input=None, pause_every=None):
+        """ The generator behind run(), when profiling is enabled. This is the
+        same loop as run_unprofiled(), except every instruction executed is
+        counted, and the time spent running it is measured. Time spent waiting
+        on the caller for input, or to take output, isn't counted. """
+
+        self.load(program, program_input)
+
+        decode_cache = self.decode_cache
+        instruction_counts = self.profile.instruction_counts
+        opcode_times = self.profile.opcode_times
+        clock = perf_counter_ns
+
+        countdown = pause_every or -1
+
+        # Execution starts a new block wherever it jumps to
+        block = self.instruction_ptr
+
+        opcode, handler, params, width = (decode_cache.get(self.instruction_ptr)
+                                          or self.decode_instruction())
+
+        while opcode != IntcodeComputer.OPCODE_HALT:
+
+            # An INPUT which has to wait for its input isn't counted until it
+            # gets it, since a caller which runs the computer on with more
+            # input does so with a new generator, which comes back to it
+            input_value = None
+            if opcode == IntcodeComputer.OPCODE_INPUT and not self.program_input:
+                self.state = IntcodeComputer.STATE_WAITING
+                input_value = yield IntcodeComputer.EVENT_NEED_INPUT, None
+                while input_value is None:
+                    input_value = yield IntcodeComputer.EVENT_NEED_INPUT, None
+                self.state = IntcodeComputer.STATE_RUNNING
+
+            address = self.instruction_ptr
+            instruction_counts[block, address, opcode] += 1
+            started = clock()
+
+            if opcode == IntcodeComputer.OPCODE_INPUT:
+                if input_value is None:
+                    input_value = self.program_input.read()
+
+                self.write_memory(params[0][0], input_value)
+                self.instruction_ptr += width
+                opcode_times[opcode] += clock() - started
+
+            elif opcode == IntcodeComputer.OPCODE_OUTPUT:
+                output_value = self.determine_param_value(*params[0])
+                self.instruction_ptr += width
+                opcode_times[opcode] += clock() - started
+                yield IntcodeComputer.EVENT_OUTPUT, output_value
+
+            elif not handler(*params):
+                self.instruction_ptr += width
+                opcode_times[opcode] += clock() - started
+
+            else:
+                opcode_times[opcode] += clock() - started
+                block = self.instruction_ptr
+
+            countdown -= 1
+            if not countdown:
+                countdown = pause_every
+                yield IntcodeComputer.EVENT_PAUSE, None
+
+            opcode, handler, params, width = (decode_cache.get(self.instruction_ptr)
+                                              or self.decode_instruction())
+
+        instruction_counts[block, self.instruction_ptr, opcode] += 1
+
 
-            # Retrieve the next opcode and param modes
-            opcode, modes = self.get_opcode_and_param_modes()
+    def enable_profiling(self, profile=None):
+        """ Starts recording instruction counts and timings into the provided
+        profile, or a new one, from the next call to run() or execute().
+        Returns the profile.
+
+        Instructions aren't fused while profiling, so every instruction is
+        counted under its own opcode and address. """
+
+        self.profile = profile if profile is not None else IntcodeProfile()
+
+        # Drop the decodings made with fusion on (only the decodings, any
+        # other code a subclass has built for the program still holds)
+        IntcodeComputer.clear_decode_cache(self)
+
+        return self.profile
+
+
+    def disable_profiling(self):
+        """ Stops recording, from the next call to run() or execute(). Returns
+        the profile that was being recorded into, if any. """
+
+        profile, self.profile = self.profile, None
+        IntcodeComputer.clear_decode_cache(self)
+
+        return profile
+
+
+    def decode_instruction(self):
+        """ Decodes the instruction at the current address of the instruction
+        pointer, caches it, and returns a tuple of the form
+        (opcode, handler, ((param1, mode1), ...), width). The cached decoding
+        is dropped if any memory it was decoded from is written to later.
+
+        If the instruction can be fused with the one after it, the returned
+        (and cached) decoding is the superinstruction covering both. """
+
+        address = self.instruction_ptr
+        opcode, modes = self.get_opcode_and_param_modes()
+
+        if opcode == IntcodeComputer.OPCODE_HALT:
+            decoded = (opcode, None, (), 1)
+        else:
+            params = self.get_parameters_for_opcode(opcode)
+            if len(params) < IntcodeComputer.OPCODE_NUM_PARAMS_MAP[opcode]:
+                raise IndexError('instruction at address {} runs past the end '
+                                 'of memory'.format(address))
+
+            params_with_modes = tuple(zip(params, modes))
+            decoded = (opcode, self.get_handler(opcode), params_with_modes, len(params) + 1)
+
+            if (self.FUSE_INSTRUCTIONS and self.profile is None
+                    and opcode in IntcodeComputer.FUSED_OPCODE_MAP):
+                decoded = self.fuse_instruction(address, decoded)
+
+        self.decode_cache[address] = decoded
+        for covered in range(address, address + decoded[3]):
+            self.decode_cache_owners.setdefault(covered, set()).add(address)
+
+        return decoded
+
+
+    def fuse_instruction(self, address, decoded):
+        """ Peephole pass over a decoded ADD, MULT, LESS or EQUALS at the
+        address. If the next instruction is a JIT or JIF testing the cell it
+        writes to, like the end of a counting loop or an if statement, returns
+        a superinstruction which runs both in one step. Otherwise returns the
+        decoding as it is. """
+
+        opcode, _, params_with_modes, width = decoded
+
+        jump_address = address + width
+        jump = self.program[jump_address : jump_address+3]
+        if len(jump) < 3:
+            return decoded
+
+        raw_opcode, condition, target = jump
+        if not 0 <= raw_opcode <= IntcodeComputer.MAX_RAW_OPCODE:
+            return decoded
+
+        jump_opcode = raw_opcode % 100
+        if jump_opcode not in (IntcodeComputer.OPCODE_JIT, IntcodeComputer.OPCODE_JIF):
+            return decoded
+
+        # The jump must read its condition from where the result was written
+        if raw_opcode // 100 % 10 != IntcodeComputer.PARAM_MODE_POSITION or condition != params_with_modes[2][0]:
+            return decoded
+
+        fused_opcode = IntcodeComputer.FUSED_OPCODE_MAP[opcode]
+        jump_if_true = jump_opcode == IntcodeComputer.OPCODE_JIT
+        target_with_mode = (target, raw_opcode // 1000 % 10)
+
+        return (fused_opcode, self.get_handler(fused_opcode),
+                params_with_modes + (jump_if_true, target_with_mode), width + 3)
+
+
+    def get_handler(self, opcode):
+        """ Returns this computer's handler method for the opcode. """
+
+        return getattr(self, IntcodeComputer.OPCODE_HANDLERS[opcode])
+
+
+    def clear_decode_cache(self):
+        """ Forgets every decoded instruction. """
+
+        self.decode_cache.clear()
+        self.decode_cache_owners.clear()
+
+
+    def write_memory(self, address, value):
+        """ Writes a value to memory at the specified address. If that address
+        is part of any decoded instruction, the decoding is dropped so that
+        self-modifying programs are re-decoded before their next step. If the
+        value is too big for the memory backend, memory is promoted first. """
+
+        try:
+            self.program[address] = value
+        except OverflowError:
+            self.promote_memory()
+            self.program[address] = value
+
+        if address in self.decode_cache_owners:
+            self.invalidate_decoded(address)
+
+
+    def promote_memory(self):
+        """ Moves memory into a list of Python ints, which can hold a value of
+        any size, for a memory backend which can't. """
+
+        self.program = promote(self.program)
+
+
+    def invalidate_decoded(self, address):
+        """ Drops the decoding of every cached instruction which covers the
+        specified address. """
+
+        for owner in self.decode_cache_owners.pop(address, ()):
+            decoded = self.decode_cache.pop(owner, None)
+            if decoded is None:
+                continue
+            for covered in range(owner, owner + decoded[3]):
+                if covered != address:
+                    self.decode_cache_owners[covered].discard(owner)
 
 
     def get_opcode_and_param_modes(self):
@@ -122,20 +626,17 @@ class IntcodeComputer:
                     A - param3 mode
         """
 
-        # Retrieve the raw opcode, interpret as a string and left-pad with
-        # zeroes until it's 5 digits in length. Facilitates determining
-        # parameter mode for up to 3 parameters.
-        raw_opcode = str(self.program[self.instruction_ptr])
-        while len(raw_opcode) < 5:
-            raw_opcode = '0' + raw_opcode
+        # Pull the opcode from the last 2 digits, and each parameter mode
+        # from the digits above those.
+        raw_opcode = self.program[self.instruction_ptr]
+        if not 0 <= raw_opcode <= IntcodeComputer.MAX_RAW_OPCODE:
+            raise ValueError('invalid opcode {} at address {}'.format(raw_opcode, self.instruction_ptr))
 
-        # Get opcode itself from last 2 digits
-        opcode = int(raw_opcode[3:])
+        opcode = raw_opcode % 100
 
-        # Get parameter modes from first 3 digits
-        param1_mode = int(raw_opcode[2])
-        param2_mode = int(raw_opcode[1])
-        param3_mode = int(raw_opcode[0])
+        param1_mode = raw_opcode // 100 % 10
+        param2_mode = raw_opcode // 1000 % 10
+        param3_mode = raw_opcode // 10000 % 10
 
         return opcode, [param1_mode, param2_mode, param3_mode]
 
@@ -159,7 +660,29 @@ class IntcodeComputer:
         # Pair the parameters with their associated parameter mode.
         params_with_modes = [(p, param_modes[i]) for i, p in enumerate(params)]
 
-        return self.opcode_map[opcode](*params_with_modes)
+        return self.get_handler(opcode)(*params_with_modes)
+
+
+    def snapshot(self):
+        """ Captures the computer's current memory, instruction pointer, state,
+        and input and output buffers into a snapshot which can be forked into
+        any number of independent computers. """
+
+        return IntcodeSnapshot(self)
+
+
+    def snapshot_at_first_input(self, program):
+        """ Executes the provided program until it first needs input, and
+        returns a snapshot of the computer at that point. Forks of the snapshot
+        pick up at that INPUT instruction, skipping the copy of the program and
+        the execution of everything before it. """
+
+        try:
+            self.execute(program)
+        except InputNotAvailableException:
+            return self.snapshot()
+
+        raise ValueError('program halted before reading any input')
 
 
     def has_output(self):
@@ -171,7 +694,14 @@ class IntcodeComputer:
     def get_output(self):
         """ Returns from the output buffer. """
 
-        return self.output_buffer.pop(0)
+        return self.output_buffer.read()
+
+
+    def send_output_to(self, callback):
+        """ Hands every output value straight to the callback as it's written,
+        rather than collecting it in the output buffer. """
+
+        self.output_buffer = SinkPort(callback)
 
 
     def determine_param_value(self, param_id, param_mode):
@@ -194,7 +724,7 @@ class IntcodeComputer:
         # ignore parameter mode, we're writing here
         output_idx = output_param[0]
 
-        self.program[output_idx] = val1 + val2
+        self.write_memory(output_idx, val1 + val2)
 
 
     def enact_mult(self, param1_with_mode, param2_with_mode, output_param):
@@ -206,7 +736,7 @@ class IntcodeComputer:
         # ignore parameter mode, we're writing here
         output_idx = output_param[0]
 
-        self.program[output_idx] = val1 * val2
+        self.write_memory(output_idx, val1 * val2)
 
 
     def enact_input(self, target_param):
@@ -219,18 +749,76 @@ class IntcodeComputer:
         # list to use here. Otherwise raise an exception to indicate no
         # input is available.
         if self.program_input:
-            input_value = self.program_input.pop(0)
+            input_value = self.program_input.read()
         else:
             raise InputNotAvailableException()
 
-        self.program[target_idx] = input_value
+        self.write_memory(target_idx, input_value)
 
 
     def enact_output(self, param1_with_mode):
         """ Executes an OUTPUT instruction. """
 
         output_value = self.determine_param_value(*param1_with_mode)
-        self.output_buffer.append(output_value)
+        self.output_buffer.write(output_value)
+
+
+    def enact_add_jump(self, param1_with_mode, param2_with_mode, output_param, jump_if_true, target_with_mode):
+        """ Executes an ADD instruction, and the jump fused after it. """
+
+        val1 = self.determine_param_value(*param1_with_mode)
+        val2 = self.determine_param_value(*param2_with_mode)
+
+        return self.write_and_jump(output_param[0], val1 + val2, jump_if_true, target_with_mode)
+
+
+    def enact_mult_jump(self, param1_with_mode, param2_with_mode, output_param, jump_if_true, target_with_mode):
+        """ Executes a MULT instruction, and the jump fused after it. """
+
+        val1 = self.determine_param_value(*param1_with_mode)
+        val2 = self.determine_param_value(*param2_with_mode)
+
+        return self.write_and_jump(output_param[0], val1 * val2, jump_if_true, target_with_mode)
+
+
+    def enact_less_than_jump(self, param1_with_mode, param2_with_mode, output_param, jump_if_true, target_with_mode):
+        """ Executes a LESS THAN instruction, and the jump fused after it. """
+
+        val1 = self.determine_param_value(*param1_with_mode)
+        val2 = self.determine_param_value(*param2_with_mode)
+
+        return self.write_and_jump(output_param[0], 1 if val1 < val2 else 0, jump_if_true, target_with_mode)
+
+
+    def enact_equals_jump(self, param1_with_mode, param2_with_mode, output_param, jump_if_true, target_with_mode):
+        """ Executes an EQUALS instruction, and the jump fused after it. """
+
+        val1 = self.determine_param_value(*param1_with_mode)
+        val2 = self.determine_param_value(*param2_with_mode)
+
+        return self.write_and_jump(output_param[0], 1 if val1 == val2 else 0, jump_if_true, target_with_mode)
+
+
+    def write_and_jump(self, output_idx, value, jump_if_true, target_with_mode):
+        """ Finishes a superinstruction. Writes the value, then runs the fused
+        JIT (if jump_if_true) or JIF, which tests that same value. Returns
+        True if the instruction pointer was set. """
+
+        address = self.instruction_ptr
+        self.write_memory(output_idx, value)
+
+        # If the write landed on the superinstruction, its decoding has been
+        # dropped, and the jump may not be a jump anymore. Stop after the
+        # first instruction, so whatever is there now is decoded from scratch.
+        if address not in self.decode_cache:
+            self.instruction_ptr = address + 4
+            return True
+
+        target = self.determine_param_value(*target_with_mode)
+
+        if (value != 0) == jump_if_true:
+            self.instruction_ptr = target
+            return True
 
 
     def enact_jit(self, param1_with_mode, param2_with_mode):
@@ -268,7 +856,7 @@ class IntcodeComputer:
         # ignore parameter mode, we're writing here
         output_idx = output_param[0]
 
-        self.program[output_idx] = 1 if val1 < val2 else 0
+        self.write_memory(output_idx, 1 if val1 < val2 else 0)
 
 
     def enact_equals(self, param1_with_mode, param2_with_mode, output_param):
@@ -282,4 +870,60 @@ class IntcodeComputer:
         # ignore parameter mode, we're writing here
         output_idx = output_param[0]
 
-        self.program[output_idx] = 1 if val1 == val2 else 0
+        self.write_memory(output_idx, 1 if val1 == val2 else 0)
+
+
+class IntcodeRunCache:
+    """ Remembers the output of running a program to completion for each
+    distinct input it has been run with, for programs which are a pure function
+    of their input. The least recently used results are forgotten once more
+    than `maxsize` distinct inputs have been seen.
+
+    Ex. an amplifier stage in day 7 is a pure function of (phase, signal)
+
+        stages = IntcodeRunCache(program)
+        signal = stages.run(phase, signal)[0] """
+
+    def __init__(self, program, maxsize=DEFAULT_RUN_CACHE_SIZE):
+        """ Initializes a cache of results for the provided program. """
+
+        self.program = [x for x in program]
+        self.snapshot = None
+        self.computer = IntcodeComputer()
+
+        self.run = lru_cache(maxsize=maxsize)(self.__run)
+
+
+    def __run(self, *program_input):
+        """ Runs the program with the provided input, and returns all of its
+        output as a tuple. """
+
+        # Every run of the program is identical up to its first input, so run
+        # that part once, and fork every later run from there.
+        if self.snapshot is None:
+            try:
+                self.snapshot = IntcodeComputer().snapshot_at_first_input([x for x in self.program])
+            except ValueError:
+                self.snapshot = False
+
+        # One computer is reused for every run, rather than built for each
+        if self.snapshot:
+            computer = self.snapshot.fork(computer=self.computer)
+            computer.execute(None, program_input=list(program_input))
+        else:
+            computer = self.computer.reset(self.program, program_input=list(program_input))
+            computer.execute(None)
+
+        return tuple(computer.output_buffer.read_many())
+
+
+    def cache_info(self):
+        """ Returns the hits, misses, maxsize and current size of the cache. """
+
+        return self.run.cache_info()
+
+
+    def cache_clear(self):
+        """ Forgets every remembered result, and resets the statistics. """
+
+        self.run.cache_clear()
@@ -0,0 +1,364 @@
+from .intcode import IntcodeComputer
+from .intcode_profiler import OPCODE_NAMES
+
+#------------------------------------------------------------------------------
+
+# Opcodes which write to memory, and the index of their destination parameter
+WRITE_PARAM_INDEX = {
+    IntcodeComputer.OPCODE_ADD:    2,
+    IntcodeComputer.OPCODE_MULT:   2,
+    IntcodeComputer.OPCODE_INPUT:  0,
+    IntcodeComputer.OPCODE_LESS:   2,
+    IntcodeComputer.OPCODE_EQUALS: 2,
+}
+
+JUMP_OPCODES = {IntcodeComputer.OPCODE_JIT, IntcodeComputer.OPCODE_JIF}
+
+#------------------------------------------------------------------------------
+
+class IntcodeInstruction:
+    """ A single decoded instruction of a program.
+
+    `destination` is the address the instruction writes to, if it writes at
+    all. For a jump, `targets` is the set of addresses it can go to next (the
+    jump target and/or the next instruction), or None if its target can't be
+    known without running the program. """
+
+    def __init__(self, address, raw_opcode, opcode, modes, params):
+        self.address = address
+        self.raw_opcode = raw_opcode
+        self.opcode = opcode
+        self.modes = modes
+        self.params = params
+        self.width = len(params) + 1
+
+        self.destination = None
+        self.targets = None
+
+
+    @property
+    def end(self):
+        return self.address + self.width
+
+
+    def __repr__(self):
+        operands = []
+        destination = ''
+        for i, (param, mode) in enumerate(zip(self.params, self.modes)):
+            if i == WRITE_PARAM_INDEX.get(self.opcode):
+                destination = ' -> [{}]'.format(param)
+            elif mode == IntcodeComputer.PARAM_MODE_IMMEDIATE:
+                operands.append('#{}'.format(param))
+            else:
+                operands.append('[{}]'.format(param))
+
+        operands = (', '.join(operands) + destination).strip()
+        return '{:>7}  {:<7} {}'.format(self.address, OPCODE_NAMES[self.opcode], operands).rstrip()
+
+
+class BasicBlock:
+    """ A straight run of instructions with a single entry at the top, which
+    ends in a jump, a HALT, or just before another block starts.
+
+    `successors` and `predecessors` hold the start addresses of neighbouring
+    blocks. A block which ends in a jump to an address only known at runtime,
+    or runs into something that isn't a valid instruction, has
+    `dynamic_exit` set, and its successors are incomplete. """
+
+    def __init__(self, start, instructions):
+        self.start = start
+        self.instructions = instructions
+        self.end = instructions[-1].end if instructions else start
+
+        self.successors = []
+        self.predecessors = []
+        self.dynamic_exit = False
+
+
+    def __repr__(self):
+        return 'BasicBlock({}..{} -> {})'.format(self.start, self.end, self.successors)
+
+
+class ControlFlowGraph:
+    """ A static analysis of an Intcode program, without running it.
+
+    The program is disassembled by following every path from the entry point,
+    which keeps data mixed in with the code from being decoded as instructions.
+    A value read from a cell that nothing in the program writes to is treated
+    as a constant, which resolves most jumps to a single target.
+
+    The reachable instructions are split into basic blocks, linked into a
+    control flow graph, and searched for loops and for writes into code. """
+
+    def __init__(self, program, entry=0):
+        """ Analyzes the provided program, starting from the entry address. """
+
+        self.program = program
+        self.entry = entry
+
+        # Cells written by the program can't be treated as constants, and
+        # finding more code can find more writes, so disassemble until none of
+        # the cells assumed to be constant turn out to be written.
+        self.decoded = dict()
+        self.written = set()
+        while True:
+            self.assumed = set()
+            self.instructions = self.disassemble()
+            written = {i.destination for i in self.instructions.values() if i.destination is not None}
+            if written <= self.written:
+                break
+            self.written |= written
+            if self.assumed.isdisjoint(self.written):
+                break
+
+        self.code = set()
+        for instruction in self.instructions.values():
+            self.code.update(range(instruction.address, instruction.end))
+
+        self.self_modifying_writes = [i for i in self.instructions.values() if i.destination in self.code]
+
+        self.build_blocks()
+        self.find_loops()
+
+
+    def disassemble(self):
+        """ Decodes every instruction reachable from the entry point, given the
+        cells currently known to be written. Returns a dict of address to
+        IntcodeInstruction. """
+
+        instructions = dict()
+        pending = [self.entry]
+
+        while pending:
+            address = pending.pop()
+
+            while address not in instructions:
+                if address in self.decoded:
+                    instruction = self.decoded[address]
+                else:
+                    instruction = self.decoded[address] = self.decode(address)
+                if instruction is None:
+                    break
+
+                instructions[address] = instruction
+                opcode = instruction.opcode
+
+                if opcode == IntcodeComputer.OPCODE_HALT:
+                    break
+
+                if opcode in JUMP_OPCODES:
+                    instruction.targets = self.jump_targets(instruction)
+                    if instruction.targets is None:
+                        break
+                    pending.extend(instruction.targets)
+                    break
+
+                address = instruction.end
+
+        return instructions
+
+
+    def decode(self, address):
+        """ Decodes the instruction at the address, or returns None if there
+        isn't a valid instruction there. """
+
+        program = self.program
+        if not 0 <= address < len(program):
+            return None
+
+        raw_opcode = program[address]
+        if not 0 <= raw_opcode <= IntcodeComputer.MAX_RAW_OPCODE:
+            return None
+
+        opcode = raw_opcode % 100
+        if opcode == IntcodeComputer.OPCODE_HALT:
+            return IntcodeInstruction(address, raw_opcode, opcode, (), ())
+
+        num_params = IntcodeComputer.OPCODE_NUM_PARAMS_MAP.get(opcode)
+        if num_params is None or address + num_params >= len(program):
+            return None
+
+        modes = (raw_opcode // 100 % 10, raw_opcode // 1000 % 10, raw_opcode // 10000 % 10)[:num_params]
+        params = tuple(program[address+1 : address+1+num_params])
+
+        instruction = IntcodeInstruction(address, raw_opcode, opcode, modes, params)
+        if opcode in WRITE_PARAM_INDEX:
+            instruction.destination = self.normalize(params[WRITE_PARAM_INDEX[opcode]])
+
+        return instruction
+
+
+    def normalize(self, address):
+        """ Returns the address in memory that the index refers to, since a
+        negative index wraps around to the end of memory. Returns None if the
+        index is outside of memory. """
+
+        if -len(self.program) <= address < 0:
+            return address + len(self.program)
+        if 0 <= address < len(self.program):
+            return address
+        return None
+
+
+    def constant_value(self, param, mode):
+        """ Returns the value of a parameter if it's the same whenever the
+        instruction runs, otherwise None. """
+
+        if mode == IntcodeComputer.PARAM_MODE_IMMEDIATE:
+            return param
+
+        address = self.normalize(param)
+        if address is None or address in self.written:
+            return None
+
+        self.assumed.add(address)
+        return self.program[address]
+
+
+    def jump_targets(self, instruction):
+        """ Returns the set of addresses a jump can go to next, or None if it
+        jumps somewhere that can't be known statically. """
+
+        condition = self.constant_value(instruction.params[0], instruction.modes[0])
+        target = self.constant_value(instruction.params[1], instruction.modes[1])
+
+        if condition is not None:
+            jumps = (condition != 0) == (instruction.opcode == IntcodeComputer.OPCODE_JIT)
+            if not jumps:
+                return {instruction.end}
+            return {target} if target is not None else None
+
+        if target is None:
+            return None
+
+        return {target, instruction.end}
+
+
+    def build_blocks(self):
+        """ Splits the instructions into basic blocks, and links the blocks
+        into a graph. """
+
+        leaders = {self.entry}
+        for instruction in self.instructions.values():
+            if instruction.opcode in JUMP_OPCODES:
+                leaders.add(instruction.end)
+                leaders.update(instruction.targets or ())
+
+        self.blocks = dict()
+        for start in leaders:
+            if start not in self.instructions:
+                continue
+
+            block_instructions = []
+            address = start
+            while address in self.instructions:
+                instruction = self.instructions[address]
+                block_instructions.append(instruction)
+                address = instruction.end
+
+                if instruction.opcode in JUMP_OPCODES or instruction.opcode == IntcodeComputer.OPCODE_HALT:
+                    break
+                if address in leaders:
+                    break
+
+            self.blocks[start] = BasicBlock(start, block_instructions)
+
+        for block in self.blocks.values():
+            last = block.instructions[-1]
+
+            if last.opcode == IntcodeComputer.OPCODE_HALT:
+                successors = []
+            elif last.opcode in JUMP_OPCODES:
+                successors = sorted(last.targets) if last.targets is not None else []
+                block.dynamic_exit = last.targets is None
+            else:
+                successors = [block.end]
+
+            for successor in successors:
+                if successor in self.blocks:
+                    block.successors.append(successor)
+                    self.blocks[successor].predecessors.append(block.start)
+                else:
+                    block.dynamic_exit = True
+
+
+    def find_loops(self):
+        """ Finds the back edges of the graph with a depth-first search from the
+        entry block, and the natural loop of each: the blocks which can reach
+        the back edge without passing through the loop's header.
+
+        Sets `back_edges` to a list of (from block, to block) and `loops` to a
+        dict of loop header to the set of blocks in the loop. """
+
+        self.back_edges = []
+        self.loops = dict()
+
+        if self.entry not in self.blocks:
+            return
+
+        on_stack = {self.entry}
+        visited = {self.entry}
+        stack = [(self.entry, iter(self.blocks[self.entry].successors))]
+
+        while stack:
+            start, successors = stack[-1]
+            for successor in successors:
+                if successor in on_stack:
+                    self.back_edges.append((start, successor))
+                elif successor not in visited:
+                    visited.add(successor)
+                    on_stack.add(successor)
+                    stack.append((successor, iter(self.blocks[successor].successors)))
+                    break
+            else:
+                stack.pop()
+                on_stack.discard(start)
+
+        for tail, header in self.back_edges:
+            body = self.loops.setdefault(header, {header})
+            pending = [tail]
+            while pending:
+                start = pending.pop()
+                if start in body:
+                    continue
+                body.add(start)
+                pending.extend(self.blocks[start].predecessors)
+
+
+    def unreachable_cells(self):
+        """ Returns the sorted addresses of every cell which isn't part of any
+        reachable instruction: data, or dead code. """
+
+        return [address for address in range(len(self.program)) if address not in self.code]
+
+
+    def listing(self):
+        """ Returns a disassembly of the whole program as a list of lines, with
+        block starts, loop headers and self-modifying writes called out, and
+        any cell which isn't reachable code shown as data. """
+
+        self_modifying = {i.address for i in self.self_modifying_writes}
+        lines = []
+        address = 0
+
+        while address < len(self.program):
+            instruction = self.instructions.get(address)
+            if instruction is None:
+                lines.append('{:>7}  DATA    {}'.format(address, self.program[address]))
+                address += 1
+                continue
+
+            if address in self.blocks:
+                notes = ['block']
+                if address in self.loops:
+                    notes.append('loop header')
+                lines.append('         ; {}'.format(', '.join(notes)))
+
+            line = repr(instruction)
+            if address in self_modifying:
+                line += '    ; writes to code'
+            lines.append(line)
+
+            address = instruction.end
+
+        return lines
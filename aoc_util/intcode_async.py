@@ -0,0 +1,89 @@
+from asyncio import Queue, gather, run, sleep
+
+from .intcode import IntcodeComputer
+
+#------------------------------------------------------------------------------
+
+# By default, a computer hands control back to the event loop after running
+# this many instructions without doing any I/O.
+DEFAULT_PAUSE_EVERY = 1000
+
+#------------------------------------------------------------------------------
+
+class AsyncIntcodeComputer(IntcodeComputer):
+    """ An Intcode computer which runs as an asyncio task, reading input from
+    and writing output to channels (anything with awaitable get() and put(),
+    like an asyncio.Queue).
+
+    A computer which needs input awaits its input channel rather than raising
+    InputNotAvailableException, and a computer which hasn't done any I/O in a
+    while pauses to let the event loop run other computers, so any number of
+    computers wired together can run in one event loop. """
+
+    def __init__(self, input_channel=None, output_channel=None, pause_every=DEFAULT_PAUSE_EVERY):
+        """ Initializes an asynchronous Intcode computer. Channels which aren't
+        provided are created as new unbounded queues. """
+
+        super().__init__()
+
+        self.input_channel = input_channel if input_channel is not None else Queue()
+        self.output_channel = output_channel if output_channel is not None else Queue()
+        self.pause_every = pause_every
+
+
+    def reset(self, program, program_input=None):
+        """ Resets the computer (see IntcodeComputer.reset) with new channels,
+        since a queue can't be carried over from one event loop to another. """
+
+        super().reset(program, program_input)
+
+        self.input_channel = Queue()
+        self.output_channel = Queue()
+
+        return self
+
+
+    async def execute_async(self, program=None, program_input=None):
+        """ Executes the provided program, with the specified input used up
+        before reading from the input channel. Completes when the program
+        halts. If no program is provided, the computer resumes from wherever
+        it stopped (for example, a computer forked from a snapshot). """
+
+        runner = self.run(program, program_input, pause_every=self.pause_every)
+        send_value = None
+
+        while True:
+            try:
+                event, value = runner.send(send_value)
+            except StopIteration:
+                return
+
+            send_value = None
+
+            if event == IntcodeComputer.EVENT_OUTPUT:
+                await self.output_channel.put(value)
+            elif event == IntcodeComputer.EVENT_NEED_INPUT:
+                send_value = await self.input_channel.get()
+            else:
+                await sleep(0)
+
+
+def connect(computers, loop_back=False):
+    """ Wires the computers into a chain, with each computer's output channel
+    becoming the next computer's input channel. Optionally, the last computer's
+    output is looped back into the first computer's input. """
+
+    for previous, following in zip(computers, computers[1:]):
+        following.input_channel = previous.output_channel
+
+    if loop_back and computers:
+        computers[0].input_channel = computers[-1].output_channel
+
+
+def run_network(computers):
+    """ Runs every computer in a single event loop, until all of them halt. """
+
+    async def run_all():
+        await gather(*(computer.execute_async() for computer in computers))
+
+    run(run_all())
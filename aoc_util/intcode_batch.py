@@ -0,0 +1,285 @@
+from time import perf_counter
+
+import numpy as np
+
+from .intcode import IntcodeComputer, InputNotAvailableException
+from .intcode_memory import ListMemory
+from .intcode_ports import IntcodePort
+
+#------------------------------------------------------------------------------
+
+# A lane whose product doesn't fit in an int64 is handed to the scalar engine,
+# which has arbitrary precision. Overflow is found by dividing the wrapped
+# product back out, which misses only INT64_MIN * -1.
+INT64_MIN = np.iinfo(np.int64).min
+
+#------------------------------------------------------------------------------
+
+class BatchIntcodeComputer:
+    """ Runs many copies of one Intcode program at once, as the rows of a NumPy
+    memory array of shape (lanes, program length).
+
+    While every lane is at the same instruction pointer, each instruction is
+    applied to all lanes in lock-step. A lane whose control flow diverges from
+    the rest (a jump taken differently, a different opcode, missing input, an
+    out-of-range address or a value which would overflow an int64) is handed
+    off to an IntcodeComputer to finish on its own. """
+
+    def __init__(self, memory_backend=ListMemory):
+        """ Initializes a batch Intcode computer. Lanes handed off to the scalar
+        engine, and the results, keep their memory with `memory_backend`. """
+
+        self.memory_backend = memory_backend
+        self.lane_instructions = 0
+        self.elapsed = 0
+
+
+    def execute(self, programs, program_inputs=None):
+        """ Executes each of the provided programs, which must all be the same
+        length, with its respective list of input. Returns one IntcodeComputer
+        per program, in the state the scalar engine would have left it. """
+
+        start = perf_counter()
+
+        num_lanes = len(programs)
+        if program_inputs is None:
+            program_inputs = [[] for _ in range(num_lanes)]
+
+        self.results = [None] * num_lanes
+
+        # Lock-step lanes are kept compacted, with a map back to their lane ids
+        self.memory = np.array(programs, dtype=np.int64)
+        self.lane_ids = np.arange(num_lanes)
+
+        longest_input = max((len(i) for i in program_inputs), default=0)
+        self.input_lengths = np.array([len(i) for i in program_inputs])
+        self.inputs = np.zeros((num_lanes, longest_input), dtype=np.int64)
+        for lane, lane_input in enumerate(program_inputs):
+            self.inputs[lane, :len(lane_input)] = lane_input
+
+        self.input_cursor = 0
+        self.outputs = list()
+
+        try:
+            self.run_lock_step()
+        finally:
+            self.elapsed += perf_counter() - start
+
+        return self.results
+
+
+    def lane_instructions_per_second(self):
+        """ Returns the throughput of the lock-step lanes so far. """
+
+        if not self.elapsed:
+            return 0
+        return self.lane_instructions / self.elapsed
+
+
+    def run_lock_step(self):
+        """ Runs the lock-step lanes until they halt, or until every lane has
+        been handed off to the scalar engine. """
+
+        ip = 0
+        program_length = self.memory.shape[1]
+
+        while len(self.lane_ids):
+
+            # Hand off every lane if the instruction doesn't fit in memory, so
+            # the scalar engine can deal with it however it does.
+            if not 0 <= ip < program_length:
+                self.hand_off(self.all_lanes(), ip)
+                break
+
+            # Lanes which have written a different instruction here can't stay
+            # in lock-step with the rest
+            raw_opcodes = self.memory[:, ip]
+            raw_opcode = int(self.majority(raw_opcodes))
+            self.hand_off(raw_opcodes != raw_opcode, ip)
+
+            if not 0 <= raw_opcode <= IntcodeComputer.MAX_RAW_OPCODE:
+                self.hand_off(self.all_lanes(), ip)
+                break
+
+            opcode = raw_opcode % 100
+            if opcode == IntcodeComputer.OPCODE_HALT:
+                self.halt(ip)
+                break
+
+            num_params = IntcodeComputer.OPCODE_NUM_PARAMS_MAP[opcode]
+            if ip + num_params >= program_length:
+                self.hand_off(self.all_lanes(), ip)
+                break
+
+            modes = (raw_opcode // 100 % 10, raw_opcode // 1000 % 10)
+            params = self.memory[:, ip+1 : ip+1+num_params]
+
+            self.lane_instructions += len(self.lane_ids)
+            ip = self.execute_instruction(ip, opcode, modes, params)
+
+
+    def execute_instruction(self, ip, opcode, modes, params):
+        """ Applies one instruction to every lock-step lane, and returns the
+        address of the next instruction. """
+
+        next_ip = ip + params.shape[1] + 1
+
+        if opcode == IntcodeComputer.OPCODE_INPUT:
+            has_input = self.input_lengths[self.lane_ids] > self.input_cursor
+            destinations = params[:, 0]
+            self.hand_off(~has_input | self.out_of_range(destinations), ip)
+
+            if len(self.lane_ids):
+                self.write(destinations[self.kept], self.inputs[:, self.input_cursor])
+                self.input_cursor += 1
+            return next_ip
+
+        values, bad_lanes = self.read_values(params, modes, min(params.shape[1], 2))
+
+        if opcode == IntcodeComputer.OPCODE_OUTPUT:
+            self.hand_off(bad_lanes, ip)
+            self.outputs.append(values[0][self.kept])
+            return next_ip
+
+        if opcode in (IntcodeComputer.OPCODE_JIT, IntcodeComputer.OPCODE_JIF):
+            self.hand_off(bad_lanes, ip)
+            condition, target = values[0][self.kept], values[1][self.kept]
+
+            jumps = condition != 0 if opcode == IntcodeComputer.OPCODE_JIT else condition == 0
+            destinations = np.where(jumps, target, next_ip)
+
+            next_ip = self.majority(destinations)
+            self.hand_off(destinations != next_ip, ip)
+            return int(next_ip)
+
+        # What's left are the opcodes which compute a value and write it
+        a, b = values
+        if opcode == IntcodeComputer.OPCODE_ADD:
+            result = a + b
+            overflowed = ((a ^ result) & (b ^ result)) < 0
+        elif opcode == IntcodeComputer.OPCODE_MULT:
+            with np.errstate(over='ignore'):
+                result = a * b
+                overflowed = (a != 0) & ((result // np.where(a == 0, 1, a) != b) |
+                                         ((a == -1) & (b == INT64_MIN)))
+        elif opcode == IntcodeComputer.OPCODE_LESS:
+            result = (a < b).astype(np.int64)
+            overflowed = False
+        else:
+            result = (a == b).astype(np.int64)
+            overflowed = False
+
+        destinations = params[:, 2]
+        self.hand_off(bad_lanes | overflowed | self.out_of_range(destinations), ip)
+        self.write(destinations[self.kept], result[self.kept])
+
+        return next_ip
+
+
+    def read_values(self, params, modes, count):
+        """ Resolves the first `count` parameters into values for each lane,
+        based on their parameter modes. Returns the values, and a mask of lanes
+        which reference an out-of-range address. """
+
+        values = []
+        bad_lanes = np.zeros(len(self.lane_ids), dtype=bool)
+
+        for i in range(count):
+            param = params[:, i]
+
+            if modes[i] == IntcodeComputer.PARAM_MODE_IMMEDIATE:
+                values.append(param)
+                continue
+
+            out_of_range = self.out_of_range(param)
+            bad_lanes |= out_of_range
+            addresses = np.where(out_of_range, 0, param)
+            values.append(self.memory[np.arange(len(param)), addresses])
+
+        return values, bad_lanes
+
+
+    def out_of_range(self, addresses):
+        """ Returns a mask of lanes where the address isn't in memory. """
+
+        program_length = self.memory.shape[1]
+        return (addresses < -program_length) | (addresses >= program_length)
+
+
+    def write(self, addresses, values):
+        """ Writes a value into each lock-step lane's memory. """
+
+        self.memory[np.arange(len(self.lane_ids)), addresses] = values
+
+
+    def majority(self, values):
+        """ Returns the most common of the values across the lanes. """
+
+        first = values[0]
+        if (values == first).all():
+            return first
+
+        unique, counts = np.unique(values, return_counts=True)
+        return unique[np.argmax(counts)]
+
+
+    def all_lanes(self):
+        """ Returns a mask selecting every lock-step lane. """
+
+        return np.ones(len(self.lane_ids), dtype=bool)
+
+
+    def hand_off(self, lanes, ip):
+        """ Removes the selected lanes from lock-step, and finishes running each
+        of them on the scalar engine, from the instruction at `ip`. Leaves
+        `kept` as a mask of the lanes which were kept, relative to the lanes
+        before the hand off. """
+
+        lanes = np.asarray(lanes, dtype=bool)
+        if lanes.ndim == 0:
+            lanes = np.full(len(self.lane_ids), bool(lanes))
+
+        self.kept = ~lanes
+        if not lanes.any():
+            return
+
+        for row in np.flatnonzero(lanes):
+            computer = self.build_computer(row, ip)
+
+            # The scalar engine continues from the computer's instruction
+            # pointer, it only resets it when constructed
+            remaining = self.inputs[row][self.input_cursor:self.input_lengths[self.lane_ids[row]]]
+            try:
+                computer.execute(computer.program, program_input=remaining.tolist())
+            except InputNotAvailableException:
+                pass
+
+            self.results[self.lane_ids[row]] = computer
+
+        self.memory = self.memory[self.kept]
+        self.lane_ids = self.lane_ids[self.kept]
+        self.inputs = self.inputs[self.kept]
+        self.outputs = [output[self.kept] for output in self.outputs]
+
+
+    def halt(self, ip):
+        """ Records the result of every lock-step lane, all of which halted at
+        the instruction at `ip`. """
+
+        for row in range(len(self.lane_ids)):
+            computer = self.build_computer(row, ip)
+            computer.state = IntcodeComputer.STATE_RUNNING
+            remaining = self.inputs[row][self.input_cursor:self.input_lengths[self.lane_ids[row]]]
+            computer.program_input = IntcodePort(remaining.tolist())
+            self.results[self.lane_ids[row]] = computer
+
+
+    def build_computer(self, row, ip):
+        """ Builds a scalar computer holding the state of a lock-step lane. """
+
+        computer = IntcodeComputer(self.memory_backend)
+        computer.program = self.memory_backend.load(self.memory[row].tolist())
+        computer.instruction_ptr = ip
+        computer.output_buffer = IntcodePort(int(output[row]) for output in self.outputs)
+
+        return computer
@@ -0,0 +1,288 @@
+import os
+import struct
+import sys
+from array import array
+
+from .files import atomic_write
+from .intcode import IntcodeComputer
+from .intcode_memory import ARRAY_TYPECODE, MEMORY_BACKENDS
+from .intcode_ports import IntcodePort
+from .intcode_trace import append_varint, read_varint, zigzag, unzigzag
+
+#------------------------------------------------------------------------------
+
+CHECKPOINT_MAGIC = b'ICCK' + (b'LE' if sys.byteorder == 'little' else b'BE')
+CHECKPOINT_VERSION = 1
+
+# Header of a checkpoint file: magic, version, kind, state, memory backend,
+# memory encoding, instruction pointer, memory length, page size, number of
+# pages stored, number of pending input values, number of output values, and
+# the length of the parent checkpoint's path.
+#
+# After the header comes the parent's path (for an incremental checkpoint),
+# the input and output values as zigzag varints, and then memory: every page
+# for a full checkpoint, or (page number, page) for each dirty page for an
+# incremental one.
+CHECKPOINT_HEADER = struct.Struct('<6sHBBBBqqqqqqq')
+
+KIND_FULL        = 0
+KIND_INCREMENTAL = 1
+
+# Memory is stored as raw signed 64-bit ints, unless it holds a value too big
+# for that, in which case every cell is a zigzag varint.
+ENCODING_INT64  = 0
+ENCODING_VARINT = 1
+
+# Number of memory cells in a page, the unit in which changes are saved in an
+# incremental checkpoint (4 KiB of int64s)
+DEFAULT_PAGE_SIZE = 512
+
+STATE_CODES = [
+    IntcodeComputer.STATE_INIT,
+    IntcodeComputer.STATE_RUNNING,
+    IntcodeComputer.STATE_WAITING,
+    IntcodeComputer.STATE_SUSPENDED,
+]
+
+BACKEND_CODES = list(MEMORY_BACKENDS)
+
+#------------------------------------------------------------------------------
+
+class CheckpointFormatError(Exception):
+    """ An exception to indicate that a checkpoint file isn't one this version
+    can read, or is missing the checkpoint it was saved relative to. """
+    pass
+
+
+class IntcodeCheckpointer:
+    """ Saves a series of checkpoints of one computer, where each checkpoint
+    after the first only holds the pages of memory which changed since the
+    checkpoint before it. Every `full_every` checkpoints a full checkpoint is
+    saved instead, so restoring never has to read too long a chain.
+
+    Ex.
+        checkpointer = IntcodeCheckpointer()
+        computer.execute(program, max_instructions=1000000)
+        while computer.state == IntcodeComputer.STATE_SUSPENDED:
+            checkpointer.save(computer, 'job.ckpt.{}'.format(checkpointer.saved))
+            computer.execute(None, max_instructions=1000000) """
+
+    def __init__(self, page_size=DEFAULT_PAGE_SIZE, full_every=16):
+        self.page_size = page_size
+        self.full_every = full_every
+
+        self.parent_path = None
+        self.parent_memory = None
+        self.saved = 0
+
+        # Every checkpoint in the current chain, back to its full checkpoint
+        self.chain = set()
+
+
+    def save(self, computer, path):
+        """ Saves a checkpoint of the computer to the path, relative to the
+        previous checkpoint saved by this checkpointer if possible.
+
+        Saving over a checkpoint in the current chain (ex. saving to the same
+        path every time) would leave a checkpoint relative to itself, or to a
+        checkpoint which is gone, so a full checkpoint is saved then. """
+
+        real_path = os.path.realpath(path)
+
+        parent = None
+        if (self.parent_memory is not None and self.saved % self.full_every != 0
+                and real_path not in self.chain):
+            parent = (self.parent_path, self.parent_memory)
+
+        self.parent_memory = write_checkpoint(path, computer, self.page_size, parent)
+        self.parent_path = path
+        self.saved += 1
+
+        # Only an int64 checkpoint with a parent is incremental
+        if parent is None or self.parent_memory is None or len(self.parent_memory) != len(parent[1]):
+            self.chain = set()
+        self.chain.add(real_path)
+
+#------------------------------------------------------------------------------
+
+def save_checkpoint(computer, path, page_size=DEFAULT_PAGE_SIZE):
+    """ Saves a full checkpoint of the computer's state to the path. """
+
+    write_checkpoint(path, computer, page_size)
+
+
+def load_checkpoint(path, computer_class=IntcodeComputer):
+    """ Restores a computer from the checkpoint at the path, along with any
+    checkpoints it was saved relative to. The computer is created with
+    `computer_class`, and keeps its memory with the backend it was saved
+    with. """
+
+    header, input_values, output_values, memory = read_checkpoint(path)
+    _, _, _, state, backend, _, instruction_ptr = header[:7]
+
+    backend = MEMORY_BACKENDS[BACKEND_CODES[backend]]
+
+    computer = computer_class()
+    computer.memory_backend = backend
+    computer.program = backend.load(memory)
+    computer.instruction_ptr = instruction_ptr
+    computer.state = STATE_CODES[state]
+    computer.program_input = IntcodePort(input_values)
+    computer.output_buffer = IntcodePort(output_values)
+
+    return computer
+
+
+def write_checkpoint(path, computer, page_size, parent=None):
+    """ Writes a checkpoint of the computer to the path, through a temporary
+    file so a crash never leaves a half written checkpoint behind.
+
+    If a parent of (path, memory bytes) is provided, only the pages which
+    differ from the parent's memory are written, unless the memory has changed
+    size or can't be stored as int64s, in which case it's written in full.
+    Returns the bytes of the memory written, or None if it wasn't int64s. """
+
+    memory = int64_memory(computer.program)
+    data = memory.tobytes() if memory is not None else None
+    input_values = list(computer.program_input or ())
+    output_values = list(computer.output_buffer)
+
+    if data is None or parent is None or len(data) != len(parent[1]):
+        parent = None
+
+    body = bytearray()
+    parent_path = b''
+
+    if parent is not None:
+        parent_path = os.path.relpath(parent[0], os.path.dirname(os.path.abspath(path))).encode()
+        body += parent_path
+
+    for value in input_values + output_values:
+        append_varint(body, zigzag(value))
+
+    pages = 0
+    if data is None:
+        encoding = ENCODING_VARINT
+        for value in computer.program:
+            append_varint(body, zigzag(value))
+
+    elif parent is None:
+        encoding = ENCODING_INT64
+        pages = -(-len(memory) // page_size)
+
+    else:
+        encoding = ENCODING_INT64
+        parent_data = parent[1]
+        page_bytes = page_size * memory.itemsize
+
+        # Comparing bytes slices is a memcmp, which is far quicker than
+        # comparing the pages cell by cell
+        for start in range(0, len(data), page_bytes):
+            page = data[start:start+page_bytes]
+            if page != parent_data[start:start+page_bytes]:
+                body += struct.pack('<q', start // page_bytes)
+                body += page
+                pages += 1
+
+    header = CHECKPOINT_HEADER.pack(
+        CHECKPOINT_MAGIC, CHECKPOINT_VERSION,
+        KIND_INCREMENTAL if parent is not None else KIND_FULL,
+        STATE_CODES.index(computer.state),
+        BACKEND_CODES.index(computer.memory_backend.name),
+        encoding, computer.instruction_ptr, len(computer.program), page_size, pages,
+        len(input_values), len(output_values), len(parent_path))
+
+    with atomic_write(path) as f:
+        f.write(header)
+        f.write(body)
+        if encoding == ENCODING_INT64 and parent is None:
+            f.write(data)
+
+    return data
+
+
+def read_checkpoint(path, visited=None):
+    """ Reads the checkpoint at the path, applying it over its parents if it's
+    incremental. Returns a tuple of (header, input values, output values,
+    memory), where memory is an array('q'), or a list if it holds values too
+    big for that. `visited` holds the real paths of the checkpoints already
+    being read further down the chain, so a chain which loops back on itself
+    raises a CheckpointFormatError rather than recursing forever. """
+
+    visited = set() if visited is None else visited
+    real_path = os.path.realpath(path)
+    if real_path in visited:
+        raise CheckpointFormatError('{} is its own parent, further up its chain of checkpoints'.format(path))
+    visited.add(real_path)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    try:
+        header = CHECKPOINT_HEADER.unpack_from(data)
+    except struct.error:
+        raise CheckpointFormatError('{} is too short to be a checkpoint'.format(path))
+
+    (magic, version, kind, _, _, encoding, _, length, page_size, pages,
+     num_inputs, num_outputs, parent_length) = header
+
+    if magic != CHECKPOINT_MAGIC:
+        raise CheckpointFormatError('{} is not a checkpoint'.format(path))
+    if version != CHECKPOINT_VERSION:
+        raise CheckpointFormatError('{} is checkpoint version {}, expected {}'.format(path, version, CHECKPOINT_VERSION))
+
+    position = CHECKPOINT_HEADER.size
+
+    parent_path = data[position:position+parent_length].decode()
+    position += parent_length
+
+    values = []
+    for _ in range(num_inputs + num_outputs):
+        value, position = read_varint(data, position)
+        values.append(unzigzag(value))
+    input_values, output_values = values[:num_inputs], values[num_inputs:]
+
+    if encoding == ENCODING_VARINT:
+        memory = []
+        for _ in range(length):
+            value, position = read_varint(data, position)
+            memory.append(unzigzag(value))
+
+    elif kind == KIND_FULL:
+        memory = array(ARRAY_TYPECODE)
+        memory.frombytes(memoryview(data)[position:position + length * memory.itemsize])
+
+    else:
+        parent_path = os.path.join(os.path.dirname(path), parent_path)
+        if not os.path.exists(parent_path):
+            raise CheckpointFormatError('{} was saved relative to {}, which is missing'.format(path, parent_path))
+
+        memory = read_checkpoint(parent_path, visited)[3]
+        page_bytes = page_size * memory.itemsize
+
+        patched = memoryview(memory).cast('B')
+        for _ in range(pages):
+            page_number, = struct.unpack_from('<q', data, position)
+            position += 8
+
+            start = page_number * page_bytes
+            end = min(start + page_bytes, len(patched))
+            patched[start:end] = data[position:position + end - start]
+            position += end - start
+
+        patched.release()
+
+    return header, input_values, output_values, memory
+
+
+def int64_memory(memory):
+    """ Returns the memory as an array('q'), or None if it holds a value too
+    big to fit in one. """
+
+    if isinstance(memory, array) and memory.typecode == ARRAY_TYPECODE:
+        return memory
+
+    try:
+        return array(ARRAY_TYPECODE, memory)
+    except OverflowError:
+        return None
@@ -0,0 +1,483 @@
+from math import inf
+from operator import itemgetter
+from time import monotonic
+
+from .intcode import DEADLINE_CHECK_INTERVAL, IntcodeComputer, InputNotAvailableException
+from .intcode_memory import ListMemory
+
+#------------------------------------------------------------------------------
+
+# Opcodes which can be compiled into the body of a block, and opcodes which
+# end a block. INPUT and HALT are never compiled, the interpreter runs those.
+BODY_OPCODES = {
+    IntcodeComputer.OPCODE_ADD,
+    IntcodeComputer.OPCODE_MULT,
+    IntcodeComputer.OPCODE_LESS,
+    IntcodeComputer.OPCODE_EQUALS,
+    IntcodeComputer.OPCODE_OUTPUT,
+}
+TERMINATOR_OPCODES = {
+    IntcodeComputer.OPCODE_JIT,
+    IntcodeComputer.OPCODE_JIF,
+}
+
+# Number of times the exact same block contents must be seen before a block
+# specialized to those contents is compiled, rather than reusing the generic
+# block compiled for that block's shape.
+SPECIALIZE_AFTER = 2
+
+# Upper bound on the number of distinct block contents counted per shape,
+# so a sweep which patches operands on every run doesn't grow without bound.
+MAX_TRACKED_CONTENTS = 4096
+
+# Upper bounds on the number of specialized variants kept per shape, and on
+# the number of shapes kept per address, since both are shared by every
+# computer for the life of the process. Like the content counts, a full cache
+# is emptied and refilled with whatever is in use now. Computers keep the
+# blocks they've already picked for their current program.
+MAX_SPECIALIZED_VARIANTS = 256
+MAX_SHAPES_PER_ADDRESS = 64
+
+# Marker for an address which hasn't been looked up yet, since None is used
+# to mark an address the interpreter has to handle.
+NOT_LOOKED_UP = object()
+
+BLOCK_SOURCE_HEADER = 'def block(m, out, code, decoded, invalidate, overflow):'
+
+#------------------------------------------------------------------------------
+
+class MemoryPromotedException(Exception):
+    """ An exception to indicate that a compiled block wrote a value too big
+    for the memory backend, so memory was promoted and the block was cut short.
+    Execution continues from the computer's instruction pointer. """
+    pass
+
+
+class CompiledBlockShape:
+    """ All compiled variants of a block of instructions starting at a given
+    address with a given sequence of opcodes and parameter modes (its shape).
+
+    The generic variant reads its operands out of memory at runtime and so can
+    run any block with this shape. Variants specialized to the exact contents
+    of the block, with every operand baked in, are compiled once those same
+    contents have been seen often enough to make the compile worthwhile. """
+
+    def __init__(self, start, instructions):
+        self.start = start
+        self.end = start + sum(len(params) + 1 for _, _, params in instructions)
+        self.num_instructions = len(instructions)
+
+        # Build a getter which retrieves all of the raw opcode cells in a single
+        # C-level call, to cheaply check whether memory holds this shape. The
+        # start is repeated at the end so the getter always returns a tuple.
+        opcode_addresses = []
+        address = start
+        for _, _, params in instructions:
+            opcode_addresses.append(address)
+            address += len(params) + 1
+
+        self.get_raw_opcodes = itemgetter(*opcode_addresses, start)
+        self.raw_opcodes = tuple(raw for raw, _, _ in instructions) + (instructions[0][0],)
+
+        self.generic = compile_block(start, instructions, specialize=False)
+        self.specialized = dict()
+        self.content_counts = dict()
+
+
+    def matches(self, memory):
+        """ Returns whether the memory holds a block of this shape. """
+
+        try:
+            return self.get_raw_opcodes(memory) == self.raw_opcodes
+        except IndexError:
+            return False
+
+
+    def get_block(self, memory):
+        """ Returns the best compiled variant of this block for the current
+        contents of the memory. """
+
+        contents = tuple(memory[self.start:self.end])
+
+        specialized = self.specialized.get(contents)
+        if specialized is not None:
+            return specialized
+
+        if len(self.content_counts) >= MAX_TRACKED_CONTENTS:
+            self.content_counts.clear()
+
+        seen = self.content_counts.get(contents, 0) + 1
+        self.content_counts[contents] = seen
+
+        if seen < SPECIALIZE_AFTER:
+            return self.generic
+
+        if len(self.specialized) >= MAX_SPECIALIZED_VARIANTS:
+            self.specialized.clear()
+
+        instructions = decode_block(memory, self.start, self.end)
+        specialized = compile_block(self.start, instructions, specialize=True)
+        self.specialized[contents] = specialized
+        del self.content_counts[contents]
+
+        return specialized
+
+
+class CompiledIntcodeComputer(IntcodeComputer):
+    """ An Intcode computer which compiles basic blocks of a program into
+    Python functions, with opcodes and parameter modes resolved ahead of time,
+    rather than decoding and dispatching one instruction at a time.
+
+    Compiled blocks are shared between every computer, so a program which is
+    run many times is only compiled once. INPUT and HALT instructions, and any
+    code the program has written over while running, are handed back to the
+    interpreter. """
+
+    # Compiled block shapes shared between all computers, keyed by the
+    # address of the start of the block.
+    block_shapes = dict()
+
+
+    def __init__(self, memory_backend=ListMemory):
+        """ Initializes a compiling Intcode computer. """
+
+        super().__init__(memory_backend)
+
+        # The compiled block to run at each address for the current program
+        # (None if the interpreter must run that address), the end address and
+        # number of instructions of each compiled block, every address covered
+        # by a compiled block, and the addresses which have been written over
+        # and must be interpreted.
+        self.blocks = dict()
+        self.block_ends = dict()
+        self.block_sizes = dict()
+        self.compiled_code = set()
+        self.interpreted = set()
+
+
+    def execute(self, program, program_input=None, max_instructions=None, deadline=None):
+        """ Executes the provided program with the specified input, running
+        compiled blocks where possible.
+
+        Budgets work the same as for the interpreter, except the budget is
+        checked between blocks. A compiled block counts as every instruction
+        in it, and one which doesn't fit in what's left of the instruction
+        budget is interpreted an instruction at a time instead, so the budget
+        is never overrun. """
+
+        # Same as the interpreter, keep memory if we're resuming after waiting
+        # for input or running out of budget, or running a program put in
+        # place by reset(), otherwise it's a fresh execution of a new program.
+        if self.state in (IntcodeComputer.STATE_WAITING, IntcodeComputer.STATE_SUSPENDED):
+            program = None
+
+        if max_instructions is not None and max_instructions < 1:
+            raise ValueError('max_instructions must be at least 1')
+
+        self.load(program, program_input)
+
+        memory = self.program
+        out = self.output_buffer.write
+        blocks = self.blocks
+        code = self.compiled_code
+        decoded = self.decode_cache_owners
+        invalidate = self.invalidate_blocks_for_write
+        overflow = self.overflow_write
+
+        # Instructions left in the budget, and until the deadline is checked
+        budgeted = max_instructions is not None or deadline is not None
+        remaining = max_instructions
+        until_check = DEADLINE_CHECK_INTERVAL if deadline is not None else inf
+
+        ip = self.instruction_ptr
+
+        while True:
+            block = blocks.get(ip, NOT_LOOKED_UP)
+            if block is NOT_LOOKED_UP:
+                block = self.find_block(ip)
+
+            if budgeted:
+                if remaining == 0 or (until_check <= 0 and monotonic() >= deadline):
+                    self.instruction_ptr = ip
+                    self.state = IntcodeComputer.STATE_SUSPENDED
+                    return
+
+                size = self.block_sizes[ip] if block is not None else 1
+                if remaining is not None:
+                    if size > remaining:
+                        block, size = None, 1
+                    remaining -= size
+
+                if until_check <= 0:
+                    until_check = DEADLINE_CHECK_INTERVAL
+                until_check -= size
+
+            if block is not None:
+                try:
+                    ip = block(memory, out, code, decoded, invalidate, overflow)
+                except MemoryPromotedException:
+                    memory = self.program
+                    ip = self.instruction_ptr
+                continue
+
+            # No compiled block here, so interpret the one instruction
+            self.instruction_ptr = ip
+            opcode, handler, params, width = (self.decode_cache.get(ip)
+                                              or self.decode_instruction())
+
+            if opcode == IntcodeComputer.OPCODE_HALT:
+                break
+
+            try:
+                skip_advance_instruction_ptr = handler(*params)
+            except InputNotAvailableException:
+                self.state = IntcodeComputer.STATE_WAITING
+                raise
+
+            ip = self.instruction_ptr if skip_advance_instruction_ptr else ip + width
+
+            # The instruction may have written a value which promoted memory
+            memory = self.program
+
+
+    def clear_decode_cache(self):
+        """ Forgets every decoded instruction, and every compiled block picked
+        for the current program, since the program in memory is about to be
+        replaced (ex. by reset() or a snapshot's fork()). """
+
+        super().clear_decode_cache()
+
+        self.blocks.clear()
+        self.block_ends.clear()
+        self.block_sizes.clear()
+        self.compiled_code.clear()
+        self.interpreted.clear()
+
+
+    def find_block(self, start):
+        """ Finds or compiles the block which starts at the specified address,
+        and registers it to run at that address. Returns None if the
+        instruction at that address must be interpreted. """
+
+        memory = self.program
+        block = None
+
+        for shape in CompiledIntcodeComputer.block_shapes.get(start, ()):
+            if shape.matches(memory) and not self.is_interpreted(shape.start, shape.end):
+                break
+        else:
+            shape = None
+            instructions = self.decode_compilable(start)
+            if instructions:
+                shape = CompiledBlockShape(start, instructions)
+
+                shapes = CompiledIntcodeComputer.block_shapes.setdefault(start, [])
+                if len(shapes) >= MAX_SHAPES_PER_ADDRESS:
+                    shapes.clear()
+                shapes.append(shape)
+
+        if shape is not None:
+            block = shape.get_block(memory)
+            self.block_ends[start] = shape.end
+            self.block_sizes[start] = shape.num_instructions
+            self.compiled_code.update(range(start, shape.end))
+
+        self.blocks[start] = block
+        return block
+
+
+    def decode_compilable(self, start):
+        """ Decodes the longest run of compilable instructions starting at the
+        specified address, ending with a jump if one is found. """
+
+        memory = self.program
+        address = start
+        instructions = []
+
+        # Leave jumps to negative addresses, which wrap around to the end of
+        # memory, to the interpreter.
+        if start < 0:
+            return instructions
+
+        while address < len(memory):
+            raw_opcode = memory[address]
+            opcode = raw_opcode % 100
+
+            if not 0 <= raw_opcode <= IntcodeComputer.MAX_RAW_OPCODE:
+                break
+            if opcode not in BODY_OPCODES and opcode not in TERMINATOR_OPCODES:
+                break
+
+            num_params = IntcodeComputer.OPCODE_NUM_PARAMS_MAP[opcode]
+            if address + num_params >= len(memory):
+                break
+            if self.is_interpreted(address, address + num_params + 1):
+                break
+
+            params = memory[address+1 : address+1+num_params]
+            instructions.append((raw_opcode, opcode, params))
+            address += num_params + 1
+
+            if opcode in TERMINATOR_OPCODES:
+                break
+
+        return instructions
+
+
+    def is_interpreted(self, start, end):
+        """ Returns whether any address in the range has been written over. """
+
+        return not self.interpreted.isdisjoint(range(start, end))
+
+
+    def write_memory(self, address, value):
+        """ Writes a value to memory, dropping any compiled block that covers
+        the written address. """
+
+        super().write_memory(address, value)
+
+        if address in self.compiled_code:
+            self.invalidate_blocks(address)
+
+
+    def invalidate_blocks_for_write(self, address, next_ip):
+        """ Called by a compiled block which has written over code that was
+        compiled or decoded. Drops the affected code and returns the address
+        at which execution should continue. """
+
+        if address in self.decode_cache_owners:
+            self.invalidate_decoded(address)
+        if address in self.compiled_code:
+            self.invalidate_blocks(address)
+
+        return next_ip
+
+
+    def overflow_write(self, address, value, next_ip):
+        """ Called by a compiled block which has computed a value too big for
+        the memory backend. Writes the value, promoting memory, and cuts the
+        block short so execution continues at `next_ip` with the new memory. """
+
+        self.write_memory(address, value)
+        self.instruction_ptr = next_ip
+
+        raise MemoryPromotedException()
+
+
+    def invalidate_blocks(self, address):
+        """ Drops every compiled block covering the address, and marks the
+        address to be interpreted from now on. """
+
+        self.interpreted.add(address)
+
+        for start, end in list(self.block_ends.items()):
+            if start <= address < end:
+                del self.blocks[start]
+                del self.block_ends[start]
+
+        self.compiled_code.clear()
+        for start, end in self.block_ends.items():
+            self.compiled_code.update(range(start, end))
+
+#------------------------------------------------------------------------------
+
+def decode_block(memory, start, end):
+    """ Decodes the instructions in memory between the two addresses into
+    (raw opcode, opcode, params) tuples. """
+
+    instructions = []
+    address = start
+
+    while address < end:
+        raw_opcode = memory[address]
+        opcode = raw_opcode % 100
+        num_params = IntcodeComputer.OPCODE_NUM_PARAMS_MAP[opcode]
+
+        instructions.append((raw_opcode, opcode, memory[address+1 : address+1+num_params]))
+        address += num_params + 1
+
+    return instructions
+
+
+def compile_block(start, instructions, specialize):
+    """ Generates and compiles a Python function which runs the instructions
+    of a block, and returns the address to continue execution from.
+
+    A specialized block has every operand baked into the generated code. A
+    generic block resolves only the parameter modes ahead of time, and reads
+    its operands from memory when it runs. """
+
+    lines = [BLOCK_SOURCE_HEADER]
+    address = start
+
+    for raw_opcode, opcode, params in instructions:
+        modes = (raw_opcode // 100 % 10, raw_opcode // 1000 % 10)
+        next_address = address + len(params) + 1
+
+        # Build an expression for the value of each parameter read
+        values = []
+        for i, mode in enumerate(modes[:min(len(params), 2)]):
+            param_address = address + 1 + i
+            if specialize:
+                operand = str(params[i])
+            else:
+                operand = 'm[{}]'.format(param_address)
+
+            if mode == IntcodeComputer.PARAM_MODE_IMMEDIATE:
+                values.append(operand)
+            else:
+                values.append('m[{}]'.format(operand))
+
+        if opcode == IntcodeComputer.OPCODE_OUTPUT:
+            lines.append('    out({})'.format(values[0]))
+
+        # The interpreter reads the jump target even when it doesn't jump, so
+        # read it up front too, in case reading it fails.
+        elif opcode == IntcodeComputer.OPCODE_JIT:
+            lines.append('    v, t = {}, {}'.format(*values))
+            lines.append('    if v != 0: return t')
+
+        elif opcode == IntcodeComputer.OPCODE_JIF:
+            lines.append('    v, t = {}, {}'.format(*values))
+            lines.append('    if v == 0: return t')
+
+        else:
+            if opcode == IntcodeComputer.OPCODE_ADD:
+                expression = '{} + {}'.format(*values)
+            elif opcode == IntcodeComputer.OPCODE_MULT:
+                expression = '{} * {}'.format(*values)
+            elif opcode == IntcodeComputer.OPCODE_LESS:
+                expression = '1 if {} < {} else 0'.format(*values)
+            else:
+                expression = '1 if {} == {} else 0'.format(*values)
+
+            # The destination is a fixed address in a specialized block, and
+            # read from memory (before the values, as the interpreter would) in
+            # a generic block. If the write lands on compiled code, bail out of
+            # the block so the code can be re-examined.
+            if specialize:
+                destination = str(params[2])
+            else:
+                lines.append('    d = m[{}]'.format(address + 3))
+                destination = 'd'
+
+            # Only sums and products can grow too big for the memory backend
+            if opcode in (IntcodeComputer.OPCODE_ADD, IntcodeComputer.OPCODE_MULT):
+                lines.append('    v = {}'.format(expression))
+                lines.append('    try:')
+                lines.append('        m[{}] = v'.format(destination))
+                lines.append('    except OverflowError:')
+                lines.append('        return overflow({}, v, {})'.format(destination, next_address))
+            else:
+                lines.append('    m[{}] = {}'.format(destination, expression))
+            lines.append('    if {0} in code or {0} in decoded: return invalidate({0}, {1})'.format(destination, next_address))
+
+        address = next_address
+
+    lines.append('    return {}'.format(address))
+
+    namespace = dict()
+    source = '\n'.join(lines)
+    exec(compile(source, '<intcode block {}>'.format(start), 'exec'), namespace)
+
+    return namespace['block']
@@ -0,0 +1,141 @@
+from array import array
+from time import perf_counter
+
+#------------------------------------------------------------------------------
+
+# Typecode for memory held in an array, and for every other array of a
+# program's ints (ex. program images and checkpoints): signed 64-bit ints
+ARRAY_TYPECODE = 'q'
+
+#------------------------------------------------------------------------------
+
+class ListMemory:
+    """ Memory held in a plain list of Python ints, which can be any size.
+
+    This is the default, and a program which is already a list is used as the
+    memory as it is, so a caller can read the results of a run straight out of
+    the list it passed in. """
+
+    name = 'list'
+
+    @staticmethod
+    def load(program):
+        """ Returns memory holding the program. """
+
+        return program if type(program) is list else list(program)
+
+
+    @staticmethod
+    def overwrite(memory, program):
+        """ Returns memory holding a copy of the program, reusing the existing
+        memory if it's a list. Unlike load(), the program is always copied,
+        never used as the memory itself. """
+
+        if type(memory) is not list or memory is program:
+            return list(program)
+
+        memory[:] = program
+        return memory
+
+
+class ArrayMemory:
+    """ Memory held in a contiguous array of signed 64-bit ints, which takes a
+    fraction of the space of a list and copies with a single memcpy, making
+    snapshots and forks cheap.
+
+    A value which doesn't fit in 64 bits can't be stored in the array, so as
+    soon as the program loads or writes one, its memory is promoted to a list
+    (see promote) and stays that way for the rest of the run. """
+
+    name = 'array'
+
+    @staticmethod
+    def load(program):
+        """ Returns memory holding the program, in an array if it fits. """
+
+        if isinstance(program, array) and program.typecode == ARRAY_TYPECODE:
+            return program
+
+        try:
+            return array(ARRAY_TYPECODE, program)
+        except OverflowError:
+            return list(program)
+
+
+    @staticmethod
+    def overwrite(memory, program):
+        """ Returns memory holding a copy of the program, reusing the existing
+        memory if it's an array. A program which is itself a buffer of int64s
+        (ex. an array, or the view of a mapped ProgramImage) the same size as
+        the memory is copied over it with a single memcpy. """
+
+        if not isinstance(memory, array) or memory.typecode != ARRAY_TYPECODE or memory is program:
+            return ArrayMemory.load(list(program))
+
+        if len(memory) == len(program):
+            try:
+                memoryview(memory)[:] = program
+                return memory
+            except (TypeError, ValueError):
+                pass
+
+        try:
+            memory[:] = array(ARRAY_TYPECODE, program)
+        except OverflowError:
+            return list(program)
+
+        return memory
+
+
+MEMORY_BACKENDS = {
+    ListMemory.name:  ListMemory,
+    ArrayMemory.name: ArrayMemory,
+}
+
+#------------------------------------------------------------------------------
+
+def promote(memory):
+    """ Returns the memory as a list of Python ints, which can hold any value.
+    Memory which is already a list is returned as it is. """
+
+    return memory if type(memory) is list else list(memory)
+
+
+def benchmark_memory_backends(program, runs=20):
+    """ Times copying the program's memory, and running it to completion, with
+    each memory backend. Returns a dict of backend name to a tuple of
+    (seconds per copy, seconds per run). The program must not need input. """
+
+    from .intcode import IntcodeComputer
+
+    results = dict()
+
+    for name, backend in MEMORY_BACKENDS.items():
+        memory = backend.load([x for x in program])
+
+        start = perf_counter()
+        for _ in range(runs):
+            memory[:]
+        copy_time = (perf_counter() - start) / runs
+
+        start = perf_counter()
+        for _ in range(runs):
+            computer = IntcodeComputer(memory_backend=backend)
+            computer.execute(memory[:])
+        run_time = (perf_counter() - start) / runs
+
+        results[name] = (copy_time, run_time)
+
+    return results
+
+#------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    # A program which counts down from 100,000 in a loop, padded out with a
+    # large block of data to copy.
+    countdown = [1101, 0, 100000, 15, 1001, 15, -1, 15, 1005, 15, 4, 4, 15, 99, 0, 0]
+    program = countdown + [7] * 100000
+
+    for name, (copy_time, run_time) in benchmark_memory_backends(program).items():
+        print('{:<8} copy {:>10.1f} us    run {:>10.1f} ms'.format(name, copy_time * 1e6, run_time * 1e3))
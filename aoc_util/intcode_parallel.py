@@ -0,0 +1,89 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from os import cpu_count
+
+from .intcode_memory import ARRAY_TYPECODE
+
+#------------------------------------------------------------------------------
+
+# Each worker gets roughly this many chunks of phase sequences, so the work
+# stays balanced without paying the round trip for every single sequence.
+CHUNKS_PER_WORKER = 4
+
+# The program read out of shared memory, once per worker process
+__worker_program = None
+
+#------------------------------------------------------------------------------
+
+def sweep_phase_sequences(program, phase_sequences, evaluate, workers=None):
+    """ Evaluates every phase sequence against the program in parallel, and
+    returns a tuple of the largest signal and the phase sequence which produced
+    it. The earliest sequence wins a tie, as it would in a sequential sweep.
+
+    `evaluate` is called as evaluate(program, phase_sequence) and returns the
+    signal for that sequence. It runs in a worker process, so it must be a
+    module-level function. The program image is handed to the workers through
+    shared memory rather than being pickled along with every task. """
+
+    phase_sequences = [tuple(s) for s in phase_sequences]
+    if not phase_sequences:
+        return None, None
+
+    workers = workers or cpu_count() or 1
+    num_chunks = workers * CHUNKS_PER_WORKER
+    chunk_size = max(1, -(-len(phase_sequences) // num_chunks))
+    chunks = [phase_sequences[i:i+chunk_size] for i in range(0, len(phase_sequences), chunk_size)]
+
+    image = array(ARRAY_TYPECODE, program)
+    shared_image = shared_memory.SharedMemory(create=True, size=max(1, len(image) * image.itemsize))
+
+    try:
+        shared_image.buf[:len(image) * image.itemsize] = image.tobytes()
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=__attach_program,
+                                 initargs=(shared_image.name, len(image))) as pool:
+
+            chunk_results = pool.map(__evaluate_chunk, [evaluate] * len(chunks), chunks)
+
+            best_signal, best_sequence = None, None
+            for signal, sequence in chunk_results:
+                if best_signal is None or signal > best_signal:
+                    best_signal, best_sequence = signal, sequence
+
+    finally:
+        shared_image.close()
+        shared_image.unlink()
+
+    return best_signal, best_sequence
+
+
+def __attach_program(shared_name, length):
+    """ Worker initializer. Reads the program image out of shared memory into
+    a list, once for the lifetime of the worker process. """
+
+    global __worker_program
+
+    shared_image = shared_memory.SharedMemory(name=shared_name)
+    try:
+        image = array(ARRAY_TYPECODE)
+        image.frombytes(bytes(shared_image.buf[:length * image.itemsize]))
+        __worker_program = image.tolist()
+    finally:
+        shared_image.close()
+
+
+def __evaluate_chunk(evaluate, phase_sequences):
+    """ Evaluates a chunk of phase sequences in a worker process, and returns
+    a tuple of the largest signal in the chunk and its phase sequence. Each
+    sequence gets a fresh copy of the program. """
+
+    best_signal, best_sequence = None, None
+
+    for sequence in phase_sequences:
+        signal = evaluate([x for x in __worker_program], sequence)
+        if best_signal is None or signal > best_signal:
+            best_signal, best_sequence = signal, sequence
+
+    return best_signal, best_sequence
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+from .intcode import IntcodeComputer
+
+#------------------------------------------------------------------------------
+
+class IntcodeComputerPool:
+    """ Hands out Intcode computers and takes them back when they're done, so
+    a job which runs a program thousands of times reuses a handful of
+    computers (and their memory) rather than building a new one every time.
+
+    Ex.
+        pool = IntcodeComputerPool()
+        for noun, verb in pairs:
+            with pool.computer(program) as computer:
+                computer.program[1:3] = [noun, verb]
+                computer.execute(None) """
+
+    def __init__(self, new_computer=IntcodeComputer, maxsize=None):
+        """ Initializes an empty pool, which builds computers by calling
+        `new_computer()` when it has none free, and keeps at most `maxsize`
+        free computers around (or any number, if not set). """
+
+        self.new_computer = new_computer
+        self.maxsize = maxsize
+
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+
+    def __len__(self):
+        return len(self.free)
+
+
+    def acquire(self, program=None, program_input=None):
+        """ Returns a computer from the pool, or a new one if none are free. If
+        a program is provided, the computer is reset with it, ready to be
+        executed with `execute(None)`. """
+
+        if self.free:
+            computer = self.free.pop()
+            self.reused += 1
+        else:
+            computer = self.new_computer()
+            self.created += 1
+
+        if program is not None:
+            computer.reset(program, program_input)
+
+        return computer
+
+
+    def release(self, computer):
+        """ Returns a computer to the pool, once the caller has finished with
+        it and everything it holds (its memory and output). """
+
+        if self.maxsize is None or len(self.free) < self.maxsize:
+            self.free.append(computer)
+
+
+    @contextmanager
+    def computer(self, program=None, program_input=None):
+        """ A context manager which acquires a computer, and releases it back
+        to the pool at the end of the block. """
+
+        computer = self.acquire(program, program_input)
+        try:
+            yield computer
+        finally:
+            self.release(computer)
@@ -0,0 +1,170 @@
+from collections import deque
+from threading import Condition
+
+#------------------------------------------------------------------------------
+
+class PortFullException(Exception):
+    """ An exception to indicate that a value couldn't be written to a port,
+    because the port is at capacity and the writer chose not to wait (or gave
+    up waiting) for a reader to make space. """
+    pass
+
+
+class IntcodePort:
+    """ A FIFO queue of values going into or coming out of an Intcode computer.
+    Reading and writing are both O(1), however many values are queued.
+
+    A port can optionally be given a capacity, in which case a writer blocks
+    until a reader has made space, applying backpressure to a producer running
+    in another thread. """
+
+    def __init__(self, values=(), capacity=None):
+        """ Initializes a port, optionally holding some values to begin with,
+        and optionally limited to holding `capacity` values. """
+
+        self.values = deque(values)
+        self.capacity = capacity
+
+        # Only a port with a capacity ever makes a writer wait
+        self.space_available = Condition() if capacity is not None else None
+
+
+    def __len__(self):
+        return len(self.values)
+
+
+    def __iter__(self):
+        return iter(self.values)
+
+
+    def __repr__(self):
+        return 'IntcodePort({})'.format(list(self.values))
+
+
+    def is_full(self):
+        """ Returns whether the port is at capacity. """
+
+        return self.capacity is not None and len(self.values) >= self.capacity
+
+
+    def read(self):
+        """ Removes and returns the oldest value in the port. Raises an
+        IndexError if the port is empty. """
+
+        value = self.values.popleft()
+
+        if self.capacity is not None:
+            with self.space_available:
+                self.space_available.notify()
+
+        return value
+
+
+    def read_many(self, count=None):
+        """ Removes and returns up to `count` of the oldest values in the port,
+        or all of them if no count is given, as a list. """
+
+        values = self.values
+        if count is None or count >= len(values):
+            taken = list(values)
+            values.clear()
+        else:
+            taken = [values.popleft() for _ in range(count)]
+
+        if self.capacity is not None and taken:
+            with self.space_available:
+                self.space_available.notify_all()
+
+        return taken
+
+
+    def clear(self):
+        """ Removes every value in the port. """
+
+        self.values.clear()
+
+        if self.capacity is not None:
+            with self.space_available:
+                self.space_available.notify_all()
+
+
+    def write(self, value, block=True, timeout=None):
+        """ Adds a value to the port. If the port is at capacity, waits for
+        space, unless told not to block or the timeout (in seconds) runs out,
+        in which case a PortFullException is raised. """
+
+        if self.capacity is None:
+            self.values.append(value)
+            return
+
+        with self.space_available:
+            if self.is_full():
+                if not block:
+                    raise PortFullException()
+                if not self.space_available.wait_for(lambda: not self.is_full(), timeout):
+                    raise PortFullException()
+
+            self.values.append(value)
+
+
+    def write_many(self, values, block=True, timeout=None):
+        """ Adds each of the values to the port, in order. """
+
+        if self.capacity is None:
+            self.values.extend(values)
+            return
+
+        for value in values:
+            self.write(value, block, timeout)
+
+
+class SinkPort:
+    """ An output port which hands every value straight to a callback as it's
+    written, and never buffers anything. """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+
+    def __len__(self):
+        return 0
+
+
+    def __iter__(self):
+        return iter(())
+
+
+    def is_full(self):
+        return False
+
+
+    def read(self):
+        raise IndexError('a sink port never holds any values')
+
+
+    def read_many(self, count=None):
+        return []
+
+
+    def clear(self):
+        pass
+
+
+    def write(self, value, block=True, timeout=None):
+        self.callback(value)
+
+
+    def write_many(self, values, block=True, timeout=None):
+        for value in values:
+            self.callback(value)
+
+#------------------------------------------------------------------------------
+
+def as_port(values):
+    """ Returns the values as a port. Ports are returned as they are, anything
+    else (like a list of input values, or None) is copied into a new port. """
+
+    if isinstance(values, (IntcodePort, SinkPort)):
+        return values
+
+    return IntcodePort(values or ())
@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+#------------------------------------------------------------------------------
+
+# Names of each opcode, for reports
+OPCODE_NAMES = {
+    1:  'ADD',
+    2:  'MULT',
+    3:  'INPUT',
+    4:  'OUTPUT',
+    5:  'JIT',
+    6:  'JIF',
+    7:  'LESS',
+    8:  'EQUALS',
+    99: 'HALT',
+
+    101: 'ADD+JMP',
+    102: 'MULT+JMP',
+    107: 'LESS+JMP',
+    108: 'EQUALS+JMP',
+}
+
+# Root frame of every stack in a collapsed stack file
+ROOT_FRAME = 'intcode'
+
+#------------------------------------------------------------------------------
+
+class IntcodeProfile:
+    """ Execution counts and timings collected by a profiling Intcode computer.
+
+    Every executed instruction is tallied by (block, address, opcode), where
+    the block is the address execution last jumped to (or started at). Time
+    spent in each opcode's handler is tallied in nanoseconds.
+
+    Intcode has no calls, so the block an instruction ran in stands in for a
+    stack frame when exporting collapsed stacks, which makes each loop of the
+    program show up as its own tower in a flamegraph. """
+
+    def __init__(self):
+        """ Initializes an empty profile. """
+
+        self.instruction_counts = defaultdict(int)
+        self.opcode_times = defaultdict(int)
+
+
+    def opcode_counts(self):
+        """ Returns a dict of opcode to the number of times it was executed. """
+
+        counts = defaultdict(int)
+        for (_, _, opcode), count in self.instruction_counts.items():
+            counts[opcode] += count
+
+        return dict(counts)
+
+
+    def address_counts(self):
+        """ Returns a dict of address to the number of instructions executed
+        at that address. """
+
+        counts = defaultdict(int)
+        for (_, address, _), count in self.instruction_counts.items():
+            counts[address] += count
+
+        return dict(counts)
+
+
+    def block_counts(self):
+        """ Returns a dict of block start address to the number of instructions
+        executed in that block. """
+
+        counts = defaultdict(int)
+        for (block, _, _), count in self.instruction_counts.items():
+            counts[block] += count
+
+        return dict(counts)
+
+
+    def total_instructions(self):
+        """ Returns the number of instructions executed. """
+
+        return sum(self.instruction_counts.values())
+
+
+    def hot_addresses(self, count=10):
+        """ Returns a list of (address, hits) for the most executed addresses,
+        most executed first. """
+
+        hits = sorted(self.address_counts().items(), key=lambda item: (-item[1], item[0]))
+        return hits[:count]
+
+
+    def report(self, count=10):
+        """ Returns a human readable report of the time and count for each
+        opcode, and the hottest addresses and blocks. """
+
+        total = self.total_instructions() or 1
+        opcode_counts = self.opcode_counts()
+
+        lines = ['{:<12}{:>12}{:>8}{:>14}{:>10}'.format('opcode', 'count', '%', 'total ms', 'ns/op')]
+        for opcode, executed in sorted(opcode_counts.items(), key=lambda item: -item[1]):
+            elapsed = self.opcode_times.get(opcode, 0)
+            lines.append('{:<12}{:>12}{:>8.1f}{:>14.3f}{:>10.0f}'.format(
+                OPCODE_NAMES.get(opcode, opcode), executed, 100 * executed / total,
+                elapsed / 1e6, elapsed / executed))
+
+        lines.append('')
+        lines.append('{:<12}{:>12}{:>8}'.format('address', 'hits', '%'))
+        for address, hits in self.hot_addresses(count):
+            lines.append('{:<12}{:>12}{:>8.1f}'.format(address, hits, 100 * hits / total))
+
+        lines.append('')
+        lines.append('{:<12}{:>12}{:>8}'.format('block', 'hits', '%'))
+        blocks = sorted(self.block_counts().items(), key=lambda item: (-item[1], item[0]))
+        for block, hits in blocks[:count]:
+            lines.append('{:<12}{:>12}{:>8.1f}'.format(block, hits, 100 * hits / total))
+
+        return '\n'.join(lines)
+
+
+    def collapsed_stacks(self):
+        """ Returns the profile as lines of collapsed stacks, weighted by the
+        number of times each instruction executed, as consumed by flamegraph
+        tools (ex. flamegraph.pl, speedscope, inferno).
+
+        Ex.
+        intcode;block@4;ADD@9 1200 """
+
+        lines = []
+        for (block, address, opcode), count in sorted(self.instruction_counts.items()):
+            frames = (ROOT_FRAME, 'block@{}'.format(block),
+                      '{}@{}'.format(OPCODE_NAMES.get(opcode, opcode), address))
+            lines.append('{} {}'.format(';'.join(frames), count))
+
+        return lines
+
+
+    def write_collapsed_stacks(self, path):
+        """ Writes the collapsed stacks to a file at the specified path. """
+
+        with open(path, 'w') as f:
+            for line in self.collapsed_stacks():
+                f.write(line + '\n')
+
+
+    def merge(self, other):
+        """ Adds the counts and timings of another profile into this one. """
+
+        for key, count in other.instruction_counts.items():
+            self.instruction_counts[key] += count
+        for opcode, elapsed in other.opcode_times.items():
+            self.opcode_times[opcode] += elapsed
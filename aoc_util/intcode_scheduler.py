@@ -0,0 +1,112 @@
+from collections import deque
+from time import monotonic
+
+from .intcode import IntcodeComputer, InputNotAvailableException
+
+#------------------------------------------------------------------------------
+
+# By default, each computer runs this many instructions per turn
+DEFAULT_QUANTUM = 1000
+
+#------------------------------------------------------------------------------
+
+class IntcodeScheduler:
+    """ Runs many Intcode computers in one thread, taking turns round-robin,
+    with each turn limited to a quantum of instructions so no computer can
+    hold up the rest.
+
+    Computers can be wired to each other by sharing ports (ex. one computer's
+    output buffer as another's program input). A computer which needs input
+    sits out until its input has something in it. Optionally, a computer can
+    be limited to a total number of instructions, after which it's stopped, so
+    a runaway program can't run forever. """
+
+    def __init__(self, quantum=DEFAULT_QUANTUM, max_instructions=None):
+        """ Initializes a scheduler which gives each computer `quantum`
+        instructions per turn, and stops any computer which has run
+        `max_instructions` instructions without halting. """
+
+        self.quantum = quantum
+        self.max_instructions = max_instructions
+
+        # Computers ready to take a turn, and computers waiting on input,
+        # each as a list of [computer, input to start with, instructions run
+        # so far]
+        self.ready = deque()
+        self.waiting = []
+
+        self.halted = []
+        self.stopped = []
+
+
+    def add(self, computer, program=None, program_input=None):
+        """ Adds a computer to the schedule. If a program is provided, it's
+        loaded into the computer now, otherwise the computer picks up from
+        wherever it is (ex. a computer forked from a snapshot). Either way,
+        ports already wired to other computers are kept, unless input is
+        provided, which replaces the computer's input port. """
+
+        # Executing a new program would replace the input port, so load it
+        # here, keeping the ports, and start the computer from memory
+        if program is not None:
+            computer.reload(program)
+
+        self.ready.append([computer, program_input, 0])
+
+
+    def run(self, deadline=None):
+        """ Takes turns until every computer has halted, been stopped, or is
+        waiting on input that nothing is left to provide. Optionally, stops
+        early once the `deadline` (a time.monotonic() time) has passed, in
+        which case calling run() again carries on from there.
+
+        Returns whether every computer has halted. """
+
+        while True:
+            self.wake_waiting()
+            if not self.ready:
+                break
+            if deadline is not None and monotonic() >= deadline:
+                break
+
+            entry = self.ready.popleft()
+            computer, program_input, executed = entry
+            entry[1] = None
+
+            budget = self.quantum
+            if self.max_instructions is not None:
+                budget = min(budget, self.max_instructions - executed)
+
+            try:
+                computer.execute(None, program_input=program_input,
+                                 max_instructions=budget, deadline=deadline)
+            except InputNotAvailableException:
+                self.waiting.append(entry)
+                continue
+
+            if computer.state != IntcodeComputer.STATE_SUSPENDED:
+                self.halted.append(computer)
+                continue
+
+            # Only a turn which used up its whole budget is counted towards the
+            # limit, which is all a runaway program ever does
+            entry[2] += budget
+            if self.max_instructions is not None and entry[2] >= self.max_instructions:
+                self.stopped.append(computer)
+            else:
+                self.ready.append(entry)
+
+        return not (self.ready or self.waiting or self.stopped)
+
+
+    def wake_waiting(self):
+        """ Moves every waiting computer which now has input back to the end of
+        the ready queue. """
+
+        if not self.waiting:
+            return
+
+        woken = [entry for entry in self.waiting if entry[0].program_input]
+        if woken:
+            self.waiting = [entry for entry in self.waiting if not entry[0].program_input]
+            self.ready.extend(woken)
@@ -0,0 +1,341 @@
+from itertools import product
+
+from .intcode import IntcodeComputer, InputNotAvailableException
+
+#------------------------------------------------------------------------------
+
+class SymbolicEvaluationFailed(Exception):
+    """ An exception to indicate that a program couldn't be evaluated with
+    symbolic memory, for example because control flow depends on a symbolic
+    value. The caller should fall back to running the program concretely. """
+    pass
+
+
+class Polynomial:
+    """ A polynomial over named symbols with integer coefficients, stored as
+    a map of monomial to coefficient. A monomial is a sorted tuple of symbol
+    names, with a name repeated once for each power.
+
+    Ex.
+    3*noun*noun + verb + 7  -->  {('noun', 'noun'): 3, ('verb',): 1, (): 7} """
+
+    def __init__(self, terms):
+        self.terms = {m: c for m, c in terms.items() if c != 0}
+
+
+    @staticmethod
+    def symbol(name):
+        """ Returns the polynomial of a single symbol. """
+
+        return Polynomial({(name,): 1})
+
+
+    @staticmethod
+    def simplify(terms):
+        """ Builds a polynomial from the terms, or just an int if the terms
+        have no symbols left in them. """
+
+        polynomial = Polynomial(terms)
+        if not polynomial.terms:
+            return 0
+        if set(polynomial.terms) == {()}:
+            return polynomial.terms[()]
+        return polynomial
+
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            other = Polynomial({(): other})
+        if not isinstance(other, Polynomial):
+            return NotImplemented
+
+        terms = dict(self.terms)
+        for monomial, coefficient in other.terms.items():
+            terms[monomial] = terms.get(monomial, 0) + coefficient
+
+        return Polynomial.simplify(terms)
+
+    __radd__ = __add__
+
+
+    def __mul__(self, other):
+        if isinstance(other, int):
+            other = Polynomial({(): other})
+        if not isinstance(other, Polynomial):
+            return NotImplemented
+
+        terms = dict()
+        for (m1, c1), (m2, c2) in product(self.terms.items(), other.terms.items()):
+            monomial = tuple(sorted(m1 + m2))
+            terms[monomial] = terms.get(monomial, 0) + c1 * c2
+
+        return Polynomial.simplify(terms)
+
+    __rmul__ = __mul__
+
+
+    def __eq__(self, other):
+        return isinstance(other, Polynomial) and self.terms == other.terms
+
+
+    def __hash__(self):
+        return hash(frozenset(self.terms.items()))
+
+
+    def __repr__(self):
+        if not self.terms:
+            return '0'
+
+        parts = []
+        for monomial, coefficient in sorted(self.terms.items()):
+            factors = list(monomial)
+            if coefficient != 1 or not factors:
+                factors.insert(0, str(coefficient))
+            parts.append('*'.join(factors))
+
+        return ' + '.join(parts)
+
+
+    def symbols(self):
+        """ Returns the set of symbols appearing in the polynomial. """
+
+        return {name for monomial in self.terms for name in monomial}
+
+
+    def degree_in(self, name):
+        """ Returns the highest power of the symbol in the polynomial. """
+
+        return max(monomial.count(name) for monomial in self.terms)
+
+
+    def evaluate(self, assignment):
+        """ Substitutes the assigned value for each symbol in the assignment.
+        Returns an int if every symbol was assigned, otherwise a polynomial
+        of the remaining symbols. """
+
+        terms = dict()
+        for monomial, coefficient in self.terms.items():
+            remaining = []
+            for name in monomial:
+                if name in assignment:
+                    coefficient *= assignment[name]
+                else:
+                    remaining.append(name)
+
+            remaining = tuple(remaining)
+            terms[remaining] = terms.get(remaining, 0) + coefficient
+
+        return Polynomial.simplify(terms)
+
+
+    def split_linear(self, name):
+        """ For a polynomial which is linear in the symbol, returns a tuple
+        (a, b) of polynomials (or ints) without that symbol, such that the
+        polynomial is equal to a*name + b. """
+
+        a_terms, b_terms = dict(), dict()
+        for monomial, coefficient in self.terms.items():
+            if name in monomial:
+                rest = list(monomial)
+                rest.remove(name)
+                a_terms[tuple(rest)] = coefficient
+            else:
+                b_terms[monomial] = coefficient
+
+        return Polynomial.simplify(a_terms), Polynomial.simplify(b_terms)
+
+
+class Unknown:
+    """ A value which can't be known symbolically, because it was read through
+    a symbolic address. Any arithmetic with it is also unknown. """
+
+    def __add__(self, other):
+        return self
+
+    __radd__ = __mul__ = __rmul__ = __add__
+
+    def __repr__(self):
+        return 'UNKNOWN'
+
+
+UNKNOWN = Unknown()
+
+#------------------------------------------------------------------------------
+
+class SymbolicIntcodeComputer(IntcodeComputer):
+    """ An Intcode computer which treats some memory cells as symbols, and
+    carries polynomials of those symbols through ADD and MULT instructions.
+
+    As long as control flow stays concrete, evaluating a program gives a
+    closed-form expression for any memory cell in terms of the symbols. Values
+    read through a symbolic address become unknown, which is fine as long as
+    they're overwritten before they're needed. Evaluation fails with a
+    SymbolicEvaluationFailed if a jump, an opcode, a write address, or the
+    target cell depends on a symbol. """
+
+    # The fused handlers would skip the symbolic overrides of each handler
+    FUSE_INSTRUCTIONS = False
+
+    def __init__(self, symbols):
+        """ Initializes a symbolic Intcode computer, where `symbols` is a dict
+        of memory address to the name of the symbol held there. """
+
+        super().__init__()
+        self.symbols = symbols
+
+
+    def evaluate(self, program, target, program_input=None):
+        """ Executes a copy of the provided program with symbols in place of
+        the chosen memory cells, and returns the value of the target address
+        when it halts, as a polynomial or an int. """
+
+        memory = [x for x in program]
+        for address, name in self.symbols.items():
+            memory[address] = Polynomial.symbol(name)
+
+        try:
+            self.execute(memory, program_input=program_input)
+        except InputNotAvailableException:
+            raise SymbolicEvaluationFailed('program needs more input than provided')
+
+        value = self.program[target]
+        if value is UNKNOWN:
+            raise SymbolicEvaluationFailed('value at address {} was read '
+                                           'through a symbolic address'.format(target))
+
+        return value
+
+
+    def decode_instruction(self):
+        """ Decodes the instruction at the instruction pointer, as long as
+        its opcode is concrete. """
+
+        raw_opcode = self.program[self.instruction_ptr]
+        if not isinstance(raw_opcode, int):
+            raise SymbolicEvaluationFailed('opcode at address {} is '
+                                           'symbolic'.format(self.instruction_ptr))
+
+        return super().decode_instruction()
+
+
+    def determine_param_value(self, param_id, param_mode):
+        """ Return a parameter's value based on its parameter mode. Reading
+        memory through a symbolic address gives an unknown value. """
+
+        if param_mode == IntcodeComputer.PARAM_MODE_IMMEDIATE:
+            return param_id
+
+        if not isinstance(param_id, int):
+            return UNKNOWN
+
+        return self.program[param_id]
+
+
+    def write_memory(self, address, value):
+        """ Writes a value to memory, as long as the address is concrete. """
+
+        if not isinstance(address, int):
+            raise SymbolicEvaluationFailed('write to a symbolic address at '
+                                           'address {}'.format(self.instruction_ptr))
+
+        super().write_memory(address, value)
+
+
+    def enact_jit(self, param1_with_mode, param2_with_mode):
+        """ Executes a JUMP IF TRUE instruction, as long as it's concrete. """
+
+        self.require_concrete(param1_with_mode, param2_with_mode)
+        return super().enact_jit(param1_with_mode, param2_with_mode)
+
+
+    def enact_jif(self, param1_with_mode, param2_with_mode):
+        """ Executes a JUMP IF FALSE instruction, as long as it's concrete. """
+
+        self.require_concrete(param1_with_mode, param2_with_mode)
+        return super().enact_jif(param1_with_mode, param2_with_mode)
+
+
+    def enact_less_than(self, param1_with_mode, param2_with_mode, output_param):
+        """ Executes a LESS THAN instruction. Comparing symbolic values gives
+        an unknown result. """
+
+        if self.is_concrete(param1_with_mode, param2_with_mode):
+            return super().enact_less_than(param1_with_mode, param2_with_mode, output_param)
+
+        self.write_memory(output_param[0], UNKNOWN)
+
+
+    def enact_equals(self, param1_with_mode, param2_with_mode, output_param):
+        """ Executes an EQUALS instruction. Comparing symbolic values gives
+        an unknown result. """
+
+        if self.is_concrete(param1_with_mode, param2_with_mode):
+            return super().enact_equals(param1_with_mode, param2_with_mode, output_param)
+
+        self.write_memory(output_param[0], UNKNOWN)
+
+
+    def is_concrete(self, *params_with_modes):
+        """ Returns whether every parameter's value is a plain int. """
+
+        return all(isinstance(self.determine_param_value(*p), int) for p in params_with_modes)
+
+
+    def require_concrete(self, *params_with_modes):
+        """ Fails the evaluation unless every parameter's value is concrete. """
+
+        if not self.is_concrete(*params_with_modes):
+            raise SymbolicEvaluationFailed('data-dependent jump at address '
+                                           '{}'.format(self.instruction_ptr))
+
+#------------------------------------------------------------------------------
+
+def solve(expression, target, domains):
+    """ Finds an assignment of values to symbols, each drawn from its domain
+    in `domains` (a dict of symbol name to iterable of values), for which the
+    expression equals the target. Returns the assignment as a dict, or None if
+    there isn't one.
+
+    If the expression is linear in some symbol, that symbol is solved for
+    directly for each assignment of the others, rather than searched. """
+
+    if isinstance(expression, int):
+        if expression != target:
+            return None
+        return {name: next(iter(domain)) for name, domain in domains.items()}
+
+    names = list(domains)
+
+    # Pick a symbol to solve for directly, if there is one
+    linear = [n for n in names if n in expression.symbols() and expression.degree_in(n) == 1]
+    solved_name = linear[-1] if linear else None
+    searched_names = [n for n in names if n != solved_name]
+
+    if solved_name is not None:
+        a, b = expression.split_linear(solved_name)
+        solved_domain = set(domains[solved_name])
+
+    for values in product(*(domains[n] for n in searched_names)):
+        assignment = dict(zip(searched_names, values))
+
+        if solved_name is None:
+            if expression.evaluate(assignment) == target:
+                return assignment
+            continue
+
+        a_value = a if isinstance(a, int) else a.evaluate(assignment)
+        b_value = b if isinstance(b, int) else b.evaluate(assignment)
+
+        # a*x + b == target, so x is (target - b) / a if that divides evenly
+        if a_value == 0:
+            if b_value == target:
+                assignment[solved_name] = next(iter(domains[solved_name]))
+                return assignment
+            continue
+
+        solution, remainder = divmod(target - b_value, a_value)
+        if remainder == 0 and solution in solved_domain:
+            assignment[solved_name] = solution
+            return assignment
+
+    return None
@@ -0,0 +1,424 @@
+from bisect import bisect_left
+
+from .intcode import IntcodeComputer
+from .intcode_ports import IntcodePort
+
+#------------------------------------------------------------------------------
+
+TRACE_MAGIC = b'ICTR'
+TRACE_VERSION = 1
+
+# Each record starts with a varint holding its kind in the low 2 bits, and its
+# first field above them. A step is the zigzag encoded difference from the
+# previous step's instruction pointer, so a run of straight-line code costs a
+# single byte per instruction. A write is stored as the difference from the
+# value it overwrote, since loop counters and accumulators change by little.
+RECORD_STEP   = 0   # <ip delta>
+RECORD_WRITE  = 1   # <address>, <value delta>
+RECORD_INPUT  = 2   # <value>
+RECORD_OUTPUT = 3   # <value>
+
+# The recorder hands its buffer to the file once it holds this many bytes, so
+# recording a long run takes a bounded amount of memory.
+FLUSH_BYTES = 1 << 16
+
+# The replayer keeps a copy of memory every this many steps, so rebuilding the
+# state at any step only has to apply the records since the nearest copy.
+KEYFRAME_INTERVAL = 1 << 16
+
+#------------------------------------------------------------------------------
+
+class TraceFormatError(Exception):
+    """ An exception to indicate that a trace isn't in a format the replayer
+    understands, or is cut short. """
+    pass
+
+
+class IntcodeTraceRecorder:
+    """ Records a single run of an Intcode program to a binary file, as the
+    initial memory followed by a record for every instruction executed, every
+    memory write, and every input and output value. """
+
+    def __init__(self, file):
+        """ Initializes a recorder which writes to the provided binary file. """
+
+        self.file = file
+        self.buffer = bytearray()
+
+        self.started = False
+        self.bytes_written = 0
+        self.last_ip = 0
+
+
+    def start(self, memory, instruction_ptr):
+        """ Writes the header, holding the memory and instruction pointer at the
+        start of the run. """
+
+        if self.started:
+            raise ValueError('a recorder can only record a single run')
+        self.started = True
+
+        self.buffer += TRACE_MAGIC
+        self.buffer.append(TRACE_VERSION)
+
+        append_varint(self.buffer, len(memory))
+        for value in memory:
+            append_varint(self.buffer, zigzag(value))
+        append_varint(self.buffer, zigzag(instruction_ptr))
+
+        self.last_ip = instruction_ptr
+
+
+    def step(self, instruction_ptr):
+        """ Records that the instruction at the address is about to run. The
+        tracing computer inlines this into its loop, this is for anything else
+        recording a trace. """
+
+        append_varint(self.buffer, zigzag(instruction_ptr - self.last_ip) << 2 | RECORD_STEP)
+        self.last_ip = instruction_ptr
+
+        if len(self.buffer) >= FLUSH_BYTES:
+            self.flush()
+
+
+    def write(self, address, old_value, value):
+        """ Records a write of the value to memory at the address, over the
+        old value. """
+
+        append_varint(self.buffer, zigzag(address) << 2 | RECORD_WRITE)
+        append_varint(self.buffer, zigzag(value - old_value))
+
+
+    def input(self, value):
+        """ Records the program reading the value from its input. """
+
+        append_varint(self.buffer, zigzag(value) << 2 | RECORD_INPUT)
+
+
+    def output(self, value):
+        """ Records the program writing the value to its output. """
+
+        append_varint(self.buffer, zigzag(value) << 2 | RECORD_OUTPUT)
+
+
+    def flush(self):
+        """ Writes everything recorded so far to the file. """
+
+        self.file.write(self.buffer)
+        self.bytes_written += len(self.buffer)
+        self.buffer.clear()
+
+
+class TracingIntcodeComputer(IntcodeComputer):
+    """ An Intcode computer which records everything it executes through an
+    IntcodeTraceRecorder. Tracing takes the place of profiling, if both are
+    enabled. """
+
+    # Every instruction gets its own step in the trace
+    FUSE_INSTRUCTIONS = False
+
+    def __init__(self, recorder):
+        """ Initializes a tracing Intcode computer, recording to `recorder`. """
+
+        super().__init__()
+        self.recorder = recorder
+
+
+    def run(self, program=None, program_input=None, pause_every=None):
+        """ Returns a generator which executes a program, exactly as run() does
+        for any other computer, while recording it. """
+
+        return self.run_traced(program, program_input, pause_every)
+
+
+    def run_traced(self, program=None, program_input=None, pause_every=None):
+        """ The generator behind run(). The recorder is flushed whenever the
+        program halts, or hands control back to the caller for input. The
+        recorder is kept up to date whenever control goes back to the caller,
+        in case the caller abandons this generator and runs the computer on. """
+
+        self.load(program, program_input)
+
+        recorder = self.recorder
+        if program is not None or not recorder.started:
+            recorder.start(self.program, self.instruction_ptr)
+
+        # Step records are written straight into the recorder's buffer, since
+        # they're by far the most common record
+        buffer = recorder.buffer
+        last_ip = recorder.last_ip
+
+        decode_cache = self.decode_cache
+        countdown = pause_every or -1
+
+        opcode, handler, params, width = (decode_cache.get(self.instruction_ptr)
+                                          or self.decode_instruction())
+
+        while True:
+
+            # An INPUT which has to wait for its input isn't recorded until it
+            # gets it, since a caller which runs the computer on with more
+            # input does so with a new generator, which comes back to it
+            input_value = None
+            if opcode == IntcodeComputer.OPCODE_INPUT and not self.program_input:
+                recorder.last_ip = last_ip
+                recorder.flush()
+                self.state = IntcodeComputer.STATE_WAITING
+                input_value = yield IntcodeComputer.EVENT_NEED_INPUT, None
+                while input_value is None:
+                    input_value = yield IntcodeComputer.EVENT_NEED_INPUT, None
+                self.state = IntcodeComputer.STATE_RUNNING
+
+            ip = self.instruction_ptr
+            delta = ip - last_ip
+            last_ip = ip
+
+            # zigzag(delta) << 2 | RECORD_STEP
+            record = delta << 3 if delta >= 0 else (-delta << 3) - 4
+            if record < 0x80:
+                buffer.append(record)
+            else:
+                append_varint(buffer, record)
+
+            if len(buffer) >= FLUSH_BYTES:
+                recorder.flush()
+
+            if opcode == IntcodeComputer.OPCODE_HALT:
+                break
+
+            if opcode == IntcodeComputer.OPCODE_INPUT:
+                if input_value is None:
+                    input_value = self.program_input.read()
+
+                recorder.input(input_value)
+                self.write_memory(params[0][0], input_value)
+                self.instruction_ptr += width
+
+            elif opcode == IntcodeComputer.OPCODE_OUTPUT:
+                output_value = self.determine_param_value(*params[0])
+                recorder.output(output_value)
+                self.instruction_ptr += width
+                recorder.last_ip = last_ip
+                yield IntcodeComputer.EVENT_OUTPUT, output_value
+
+            elif not handler(*params):
+                self.instruction_ptr += width
+
+            countdown -= 1
+            if not countdown:
+                countdown = pause_every
+                recorder.last_ip = last_ip
+                yield IntcodeComputer.EVENT_PAUSE, None
+
+            opcode, handler, params, width = (decode_cache.get(self.instruction_ptr)
+                                              or self.decode_instruction())
+
+        recorder.last_ip = last_ip
+        recorder.flush()
+
+
+    def write_memory(self, address, value):
+        """ Writes a value to memory, and records the write. """
+
+        old_value = self.program[address]
+        super().write_memory(address, value)
+        self.recorder.write(address, old_value, value)
+
+
+class IntcodeTrace:
+    """ A recorded trace of an Intcode run, which can rebuild the state of the
+    computer just before any step of the run, without running the program.
+
+    Steps are numbered from 0, one per instruction executed, with the HALT
+    instruction (if the run got that far) as the last step. """
+
+    def __init__(self, data):
+        """ Reads a trace from the bytes of a trace file. """
+
+        self.data = bytes(data)
+
+        if self.data[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+            raise TraceFormatError('not an Intcode trace')
+        if self.data[len(TRACE_MAGIC)] != TRACE_VERSION:
+            raise TraceFormatError('unsupported trace version {}'.format(self.data[len(TRACE_MAGIC)]))
+
+        position = len(TRACE_MAGIC) + 1
+        length, position = read_varint(self.data, position)
+
+        self.initial_memory = []
+        for _ in range(length):
+            value, position = read_varint(self.data, position)
+            self.initial_memory.append(unzigzag(value))
+
+        value, position = read_varint(self.data, position)
+        self.initial_ip = unzigzag(value)
+
+        self.records_start = position
+        self.index()
+
+
+    @staticmethod
+    def load(path):
+        """ Reads a trace from the file at the specified path. """
+
+        with open(path, 'rb') as f:
+            return IntcodeTrace(f.read())
+
+
+    def __len__(self):
+        return self.steps
+
+
+    def index(self):
+        """ Reads through every record once, counting the steps, collecting the
+        input and output values (and the step at which each was read or
+        written), and keeping a copy of memory every KEYFRAME_INTERVAL steps.
+
+        A keyframe is a tuple of (step, position of its step record, the
+        instruction pointer before that step, memory before that step). """
+
+        self.keyframes = []
+        self.inputs, self.input_steps = [], []
+        self.outputs, self.output_steps = [], []
+
+        memory = list(self.initial_memory)
+        ip = self.initial_ip
+        step = 0
+
+        data = self.data
+        position = self.records_start
+
+        while position < len(data):
+            record_start = position
+            record, position = read_varint(data, position)
+            kind, field = record & 3, record >> 2
+
+            if kind == RECORD_STEP:
+                if step % KEYFRAME_INTERVAL == 0:
+                    self.keyframes.append((step, record_start, ip, list(memory)))
+                ip += unzigzag(field)
+                step += 1
+
+            elif kind == RECORD_WRITE:
+                value, position = read_varint(data, position)
+                memory[unzigzag(field)] += unzigzag(value)
+
+            elif kind == RECORD_INPUT:
+                self.inputs.append(unzigzag(field))
+                self.input_steps.append(step - 1)
+
+            else:
+                self.outputs.append(unzigzag(field))
+                self.output_steps.append(step - 1)
+
+        self.steps = step
+
+
+    def instruction_pointers(self):
+        """ Generates the address of the instruction run at each step. """
+
+        data = self.data
+        position = self.records_start
+        ip = self.initial_ip
+
+        while position < len(data):
+            record, position = read_varint(data, position)
+            kind, field = record & 3, record >> 2
+
+            if kind == RECORD_STEP:
+                ip += unzigzag(field)
+                yield ip
+            elif kind == RECORD_WRITE:
+                _, position = read_varint(data, position)
+
+
+    def state_at(self, step):
+        """ Returns a computer in the state it was in just before the specified
+        step ran. Its output buffer holds everything output before that step,
+        and its input holds every value the run went on to read, so executing
+        it continues the run exactly as it was recorded. """
+
+        if not 0 <= step < self.steps:
+            raise IndexError('step {} is not in a trace of {} steps'.format(step, self.steps))
+
+        keyframe_step, position, ip, memory = self.keyframes[step // KEYFRAME_INTERVAL]
+        memory = list(memory)
+
+        data = self.data
+        current = keyframe_step
+
+        while True:
+            record, position = read_varint(data, position)
+            kind, field = record & 3, record >> 2
+
+            if kind == RECORD_STEP:
+                ip += unzigzag(field)
+                if current == step:
+                    break
+                current += 1
+
+            elif kind == RECORD_WRITE:
+                value, position = read_varint(data, position)
+                memory[unzigzag(field)] += unzigzag(value)
+
+        computer = IntcodeComputer()
+        computer.program = memory
+        computer.instruction_ptr = ip
+        computer.state = IntcodeComputer.STATE_RUNNING
+
+        computer.output_buffer = IntcodePort(self.outputs[:bisect_left(self.output_steps, step)])
+        computer.program_input = IntcodePort(self.inputs[bisect_left(self.input_steps, step):])
+
+        return computer
+
+#------------------------------------------------------------------------------
+
+def zigzag(n):
+    """ Maps a signed int onto an unsigned one, with small magnitudes staying
+    small: 0, -1, 1, -2, 2  -->  0, 1, 2, 3, 4 """
+
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def unzigzag(n):
+    """ Reverses zigzag(). """
+
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def append_varint(buffer, n):
+    """ Appends an unsigned int of any size to the buffer, 7 bits per byte,
+    least significant first, with the high bit set on all but the last. """
+
+    while n >= 0x80:
+        buffer.append(n & 0x7f | 0x80)
+        n >>= 7
+    buffer.append(n)
+
+
+def read_varint(data, position):
+    """ Reads an unsigned varint from the data at the position, and returns a
+    tuple of the value and the position just after it. """
+
+    # Most varints in a trace are a single byte
+    try:
+        byte = data[position]
+    except IndexError:
+        raise TraceFormatError('trace ends in the middle of a record')
+    if byte < 0x80:
+        return byte, position + 1
+
+    value = 0
+    shift = 0
+
+    while True:
+        try:
+            byte = data[position]
+        except IndexError:
+            raise TraceFormatError('trace ends in the middle of a record')
+
+        value |= (byte & 0x7f) << shift
+        position += 1
+        if byte < 0x80:
+            return value, position
+        shift += 7
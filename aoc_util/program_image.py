@@ -0,0 +1,167 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from hashlib import sha256
+
+from .files import atomic_write
+from .intcode_memory import ARRAY_TYPECODE
+
+#------------------------------------------------------------------------------
+
+# Where the binary image of an input file is cached, relative to the input
+IMAGE_CACHE_DIR = '.cache'
+IMAGE_FILE_EXT = '.img'
+
+# Header of an image file: magic (with the byte order of the ints after it),
+# the mtime and size of the input file it was parsed from, the number of ints,
+# and the SHA-256 of the input text. The ints start right after, at a 64 byte
+# boundary, as raw signed 64-bit ints.
+IMAGE_MAGIC = b'ICIMG1' + (b'LE' if sys.byteorder == 'little' else b'BE')
+IMAGE_HEADER = struct.Struct('<8sqqq32s')
+
+#------------------------------------------------------------------------------
+
+class ProgramImage:
+    """ An Intcode program parsed into signed 64-bit ints, memory-mapped from
+    a cached binary image so that it doesn't need to be parsed again.
+
+    Computers are seeded from the mapping with a single copy of the raw bytes,
+    rather than an int() per token. A program with a value too big for 64
+    bits can't be mapped, and is held in a list instead. """
+
+    def __init__(self, mapping=None, values=None):
+        self.mapping = mapping
+        self.values = values
+
+        # The raw bytes of the ints in the mapping, and a view of them as ints
+        if mapping is not None:
+            self.data = memoryview(mapping)[IMAGE_HEADER.size:]
+            self.view = self.data.cast(ARRAY_TYPECODE)
+
+
+    def __len__(self):
+        return len(self.view) if self.mapping is not None else len(self.values)
+
+
+    def as_list(self):
+        """ Returns a new list holding the program, for the list memory
+        backend (or any code expecting a plain list). """
+
+        if self.mapping is None:
+            return list(self.values)
+
+        return self.view.tolist()
+
+
+    def as_array(self):
+        """ Returns a new array('q') holding the program, copied straight from
+        the mapping, for the array memory backend. """
+
+        if self.mapping is None:
+            try:
+                return array(ARRAY_TYPECODE, self.values)
+            except OverflowError:
+                return list(self.values)
+
+        memory = array(ARRAY_TYPECODE)
+        memory.frombytes(self.data)
+
+        return memory
+
+
+    def close(self):
+        """ Releases the mapping. """
+
+        if self.mapping is not None:
+            self.view.release()
+            self.data.release()
+            self.mapping.close()
+            self.mapping = None
+
+#------------------------------------------------------------------------------
+
+def load_program_image(path):
+    """ Returns the comma-separated Intcode program in the file at the path as
+    a ProgramImage.
+
+    The parsed program is cached in a binary image file beside the input. The
+    image is used as long as the input's mtime and size haven't changed, or
+    failing that, as long as the input's content hash still matches (in which
+    case the image is brought up to date with the new mtime). Otherwise the
+    input is parsed again, and the image rewritten. """
+
+    image_path = __get_image_path(path)
+    stat = os.stat(path)
+
+    header = __read_header(image_path)
+    if header is not None and header[1:3] == (stat.st_mtime_ns, stat.st_size):
+        return ProgramImage(mapping=__map_image(image_path))
+
+    with open(path, 'rb') as f:
+        text = f.read()
+    digest = sha256(text).digest()
+
+    if header is not None and header[4] == digest:
+        with open(image_path, 'r+b') as f:
+            f.write(IMAGE_HEADER.pack(IMAGE_MAGIC, stat.st_mtime_ns, stat.st_size, header[3], digest))
+        return ProgramImage(mapping=__map_image(image_path))
+
+    values = [int(token) for token in text.split(b',') if token.strip()]
+
+    try:
+        image = array(ARRAY_TYPECODE, values)
+    except OverflowError:
+        return ProgramImage(values=values)
+
+    __write_image(image_path, image, stat, digest)
+
+    return ProgramImage(mapping=__map_image(image_path))
+
+
+def __get_image_path(path):
+    """ Returns the path of the cached image for the input file at the path.
+
+    Ex.
+    inputs/input_day5.txt  -->  inputs/.cache/input_day5.txt.img """
+
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, IMAGE_CACHE_DIR, filename + IMAGE_FILE_EXT)
+
+
+def __read_header(image_path):
+    """ Returns the unpacked header of the image at the path, or None if there
+    isn't a valid image there. """
+
+    try:
+        with open(image_path, 'rb') as f:
+            header = IMAGE_HEADER.unpack(f.read(IMAGE_HEADER.size))
+        image_size = os.stat(image_path).st_size
+    except (OSError, struct.error):
+        return None
+
+    if header[0] != IMAGE_MAGIC:
+        return None
+    if image_size != IMAGE_HEADER.size + header[3] * array(ARRAY_TYPECODE).itemsize:
+        return None
+
+    return header
+
+
+def __write_image(image_path, image, stat, digest):
+    """ Writes the image to the path, through a temporary file, so a reader
+    never maps a half written image. """
+
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+
+    with atomic_write(image_path) as f:
+        f.write(IMAGE_HEADER.pack(IMAGE_MAGIC, stat.st_mtime_ns, stat.st_size, len(image), digest))
+        f.write(image.tobytes())
+
+
+def __map_image(image_path):
+    """ Memory-maps the image at the path, read only. """
+
+    with open(image_path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
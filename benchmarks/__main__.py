@@ -0,0 +1,8 @@
+import sys
+
+from .intcode_bench import main
+
+#------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import json
+import os
+import platform
+import tracemalloc
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter_ns
+
+from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_profiler import IntcodeProfile
+
+from .intcode_workloads import get_workloads
+
+#------------------------------------------------------------------------------
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+DEFAULT_REPEAT = 10
+DEFAULT_WARMUP = 1
+
+# A workload regresses if it gets this much slower (or hungrier for memory)
+# than the baseline, as a fraction of the baseline
+DEFAULT_THRESHOLD = 0.10
+
+PERCENTILES = (50, 90, 99)
+
+# A workload quicker than this is run several times per timed sample, so the
+# timer's resolution and one-off hiccups don't swamp the measurement
+MIN_SAMPLE_NS = 20000000
+
+#------------------------------------------------------------------------------
+
+def count_instructions(workload):
+    """ Returns the number of instructions the workload executes. The
+    profiler turns fusion off, so the count stays the same as the engine
+    changes how many instructions it runs at once. """
+
+    profile = IntcodeProfile()
+
+    def new_computer():
+        computer = IntcodeComputer()
+        computer.enable_profiling(profile)
+        return computer
+
+    workload.run(new_computer)
+
+    return profile.total_instructions()
+
+
+def measure_peak_memory(workload):
+    """ Returns the peak number of bytes allocated while running the workload
+    once. Tracing allocations slows everything down, so this is measured on a
+    run of its own, apart from the timed runs. """
+
+    tracemalloc.start()
+    try:
+        workload.run(IntcodeComputer)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def percentile(sorted_values, pct):
+    """ Returns the pct'th percentile of the sorted values, interpolating
+    between the two nearest values. """
+
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def benchmark_workload(workload, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP):
+    """ Runs the workload `warmup` times untimed, then `repeat` times timed,
+    and returns a dict of its results: instructions executed, instructions per
+    second (at the median latency), peak memory, and latencies in ns.
+
+    A quick workload is run `loops` times back to back per timed sample, and
+    its latencies are the average run within each sample. """
+
+    instructions = count_instructions(workload)
+    peak_memory = measure_peak_memory(workload)
+
+    # Time the warmup runs to decide how many runs go into each sample
+    loops = 1
+    for _ in range(warmup):
+        start = perf_counter_ns()
+        workload.run(IntcodeComputer)
+        elapsed = perf_counter_ns() - start
+        loops = max(1, -(-MIN_SAMPLE_NS // max(elapsed, 1)))
+
+    latencies = []
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        for _ in range(loops):
+            workload.run(IntcodeComputer)
+        latencies.append((perf_counter_ns() - start) / loops)
+    latencies.sort()
+
+    result = {
+        'description': workload.description,
+        'instructions': instructions,
+        'instructions_per_sec': instructions * 1e9 / median(latencies),
+        'peak_memory_bytes': peak_memory,
+        'loops': loops,
+        'latency_ns': {
+            'min': latencies[0],
+            'max': latencies[-1],
+            'median': median(latencies),
+        },
+    }
+    for pct in PERCENTILES:
+        result['latency_ns']['p{}'.format(pct)] = percentile(latencies, pct)
+
+    return result
+
+
+def run_benchmarks(workloads=None, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP, log=None):
+    """ Benchmarks every workload (or just the provided ones) and returns the
+    results as a dict, ready to be saved as a baseline. Optionally, `log` is
+    called with a line of progress after each workload. """
+
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'workloads': dict(),
+    }
+
+    for workload in workloads if workloads is not None else get_workloads():
+        result = benchmark_workload(workload, repeat, warmup)
+        results['workloads'][workload.name] = result
+        if log:
+            log(format_result(workload.name, result))
+
+    return results
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """ Compares the results against a baseline, and returns a list of a
+    message for every workload which regressed by more than the threshold: a
+    slower fastest run, or a higher peak memory. Workloads missing from either
+    side are skipped.
+
+    The fastest run is compared rather than the median, since noise from the
+    rest of the machine only ever makes a run slower. """
+
+    regressions = []
+
+    for name, result in results['workloads'].items():
+        base = baseline['workloads'].get(name)
+        if base is None:
+            continue
+
+        checks = [
+            ('fastest run ns', result['latency_ns']['min'], base['latency_ns']['min']),
+            ('peak memory', result['peak_memory_bytes'], base['peak_memory_bytes']),
+        ]
+
+        for metric, value, base_value in checks:
+            if not base_value:
+                continue
+            change = (value - base_value) / base_value
+            if change > threshold:
+                regressions.append('{}: {} {:+.1%} ({:.4g} -> {:.4g})'.format(
+                    name, metric, change, base_value, value))
+
+    return regressions
+
+
+def format_result(name, result):
+    """ Returns a one line summary of a workload's results. """
+
+    latency = result['latency_ns']
+    return '{:<16}{:>14,.0f} ins/s{:>10.2f} ms median{:>10.2f} ms p99{:>10.1f} KiB peak'.format(
+        name, result['instructions_per_sec'], latency['median'] / 1e6,
+        latency['p99'] / 1e6, result['peak_memory_bytes'] / 1024)
+
+
+def load_baseline(path):
+    """ Returns the baseline saved at the path, or None if there isn't one. """
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path):
+    """ Saves the results as the baseline at the path. """
+
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+#------------------------------------------------------------------------------
+
+def main(args=None):
+    """ Runs the benchmark suite from the command line. Returns the exit code:
+    1 if any workload regressed past the threshold, otherwise 0. """
+
+    parser = ArgumentParser(description='Benchmark the Intcode computer against a saved baseline.')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file to compare against')
+    parser.add_argument('--update', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fraction a workload can regress by before failing (default %(default)s)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed runs per workload')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help='untimed runs per workload')
+    parser.add_argument('workloads', nargs='*', help='names of the workloads to run (default all)')
+    args = parser.parse_args(args)
+
+    workloads = get_workloads()
+    if args.workloads:
+        unknown = set(args.workloads) - {w.name for w in workloads}
+        if unknown:
+            parser.error('unknown workloads: {}'.format(', '.join(sorted(unknown))))
+        workloads = [w for w in workloads if w.name in args.workloads]
+
+    results = run_benchmarks(workloads, args.repeat, args.warmup, log=print)
+
+    if args.update:
+        save_baseline(results, args.baseline)
+        print('\nSaved baseline to {}'.format(args.baseline))
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print('\nNo baseline at {}, run with --update to save one'.format(args.baseline))
+        return 0
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print('\nRegressed by more than {:.0%}:'.format(args.threshold))
+        for regression in regressions:
+            print('  ' + regression)
+        return 1
+
+    print('\nNo regressions past {:.0%}'.format(args.threshold))
+    return 0
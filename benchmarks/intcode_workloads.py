@@ -0,0 +1,220 @@
+import os
+from itertools import permutations
+
+from aoc_util.intcode import IntcodeComputer, InputNotAvailableException
+from aoc_util.intcode_scheduler import IntcodeScheduler
+from aoc_util.program_image import load_program_image
+
+#------------------------------------------------------------------------------
+
+# Where the day programs are read from, relative to the root of the repo
+INPUTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs')
+DAY_INPUT_TEMPLATE = 'input_day{}.txt'
+
+#------------------------------------------------------------------------------
+
+class IntcodeWorkload:
+    """ A fixed Intcode job to benchmark.
+
+    `run` is called as run(new_computer) and runs the job to completion once,
+    creating every computer it needs by calling new_computer(), so the harness
+    can time it, count the instructions it executes, and so on. Every run gets
+    a fresh copy of the program, so runs are independent of each other. """
+
+    def __init__(self, name, description, run):
+        self.name = name
+        self.description = description
+        self.run = run
+
+
+    def __repr__(self):
+        return 'IntcodeWorkload({})'.format(self.name)
+
+#------------------------------------------------------------------------------
+
+def tight_loop(iterations=30000):
+    """ A loop of arithmetic and a conditional jump over a handful of cells,
+    which is about as hot as a dispatch loop gets. """
+
+    program = [1101, 0, iterations, 100,   # counter = iterations
+               1002, 100, 2, 102,          # temp = counter * 2
+               1, 101, 102, 101,           # total += temp
+               1001, 100, -1, 100,         # counter -= 1
+               1005, 100, 4,               # loop while counter != 0
+               4, 101,
+               99]
+    program += [0] * (103 - len(program))
+
+    def run(new_computer):
+        new_computer().execute(program[:])
+
+    return IntcodeWorkload('tight_loop', 'countdown loop, {} iterations'.format(iterations), run)
+
+
+def multiply_chain(length=10000):
+    """ A long straight run of MULTs with no jumps, so each instruction is
+    decoded and run exactly once. The running product is reset every so often
+    to keep it inside 64 bits. """
+
+    program = []
+    for i in range(length):
+        if i % 32 == 0:
+            program += [1101, 0, 1, 0]     # product = 1, patched below
+        else:
+            program += [1002, 0, 3, 0]     # product *= 3
+    program += [4, 0, 99]
+
+    product = len(program)
+    program.append(0)
+    for i in range(0, len(program) - 4, 4):
+        program[i+3] = product
+        if program[i] == 1002:
+            program[i+1] = product
+
+    def run(new_computer):
+        new_computer().execute(program[:])
+
+    return IntcodeWorkload('multiply_chain', '{} straight-line MULTs'.format(length), run)
+
+
+def echo(values=20000):
+    """ Reads every input value and writes it straight back out, so the time
+    is dominated by moving values through the ports. """
+
+    program = [3, 100,                     # value = input
+               4, 100,                     # output value
+               1001, 101, -1, 101,         # remaining -= 1
+               1005, 101, 0,               # loop while remaining != 0
+               99]
+    program += [0] * (102 - len(program))
+    program[101] = values
+
+    program_input = list(range(values))
+
+    def run(new_computer):
+        computer = new_computer()
+        computer.execute(program[:], program_input=program_input[:])
+        computer.output_buffer.read_many()
+
+    return IntcodeWorkload('echo', 'echo {} values through the ports'.format(values), run)
+
+
+def day2(program):
+    """ Day 2, part one: run the program with the noun and verb patched in. """
+
+    program = program[:]
+    program[1] = 12
+    program[2] = 2
+
+    def run(new_computer):
+        new_computer().execute(program[:])
+
+    return IntcodeWorkload('day2', 'day 2 gravity assist, noun 12 verb 2', run)
+
+
+def day5(program):
+    """ Day 5, both parts: run the diagnostic with system IDs 1 and 5. """
+
+    def run(new_computer):
+        for system_id in (1, 5):
+            new_computer().execute(program[:], program_input=[system_id])
+
+    return IntcodeWorkload('day5', 'day 5 diagnostics, system IDs 1 and 5', run)
+
+
+def day7(program):
+    """ Day 7, both parts: every phase sequence through the amplifier chain,
+    and every phase sequence around the feedback loop, all in one thread so
+    that it's only the computer being measured.
+
+    The best signal for each part is worked out once up front, without the
+    scheduler, and every run has to match it, so a run which stops making
+    progress fails rather than timing nothing. """
+
+    expected = (max(__chain_signal(program, phases, IntcodeComputer) for phases in permutations(range(5))),
+                max(__feedback_signal(program, phases) for phases in permutations(range(5, 10))))
+
+    def run(new_computer):
+        best_chain = max(__chain_signal(program, phases, new_computer) for phases in permutations(range(5)))
+
+        best_feedback = None
+        for phase_sequence in permutations(range(5, 10)):
+            # Reset first, since loading a program replaces the input port
+            # the previous amp has to be wired to
+            amps = [new_computer().reset(program) for _ in phase_sequence]
+            for i, (amp, phase) in enumerate(zip(amps, phase_sequence)):
+                amp.output_buffer = amps[(i + 1) % len(amps)].program_input
+                amp.program_input.write(phase)
+            amps[0].program_input.write(0)
+
+            scheduler = IntcodeScheduler()
+            for amp in amps:
+                scheduler.add(amp)
+            if not scheduler.run():
+                raise RuntimeError('day 7 feedback loop {} stalled'.format(phase_sequence))
+
+            # The last amp's final signal is left in the first amp's input
+            signal = amps[0].program_input.read()
+            best_feedback = signal if best_feedback is None else max(best_feedback, signal)
+
+        if (best_chain, best_feedback) != expected:
+            raise RuntimeError('day 7 gave signals {}, expected {}'.format((best_chain, best_feedback), expected))
+
+    return IntcodeWorkload('day7', 'day 7 amplifiers, chain and feedback loop', run)
+
+
+def __chain_signal(program, phase_sequence, new_computer):
+    """ Returns the signal out of the end of the amplifier chain. """
+
+    signal = 0
+    for phase in phase_sequence:
+        computer = new_computer()
+        try:
+            computer.execute(program[:], program_input=[phase, signal])
+        except InputNotAvailableException:
+            # A program written only for the feedback loop asks for
+            # another signal instead of halting
+            pass
+        signal = computer.get_output()
+
+    return signal
+
+
+def __feedback_signal(program, phase_sequence):
+    """ Returns the final signal around the feedback loop, passing the signal
+    from amp to amp by hand rather than with a scheduler. """
+
+    amps = [IntcodeComputer() for _ in phase_sequence]
+    for amp, phase in zip(amps, phase_sequence):
+        amp.reset(program, program_input=[phase])
+
+    signal = 0
+    while True:
+        for amp in amps:
+            amp.program_input.write(signal)
+            try:
+                amp.execute(None)
+                halted = True
+            except InputNotAvailableException:
+                halted = False
+            signal = amp.get_output()
+
+        if halted:
+            return signal
+
+#------------------------------------------------------------------------------
+
+def get_workloads():
+    """ Returns every workload, in the order they're run. A day's workload is
+    left out if its input isn't in the inputs directory. """
+
+    workloads = [tight_loop(), multiply_chain(), echo()]
+
+    for day_num, workload in ((2, day2), (5, day5), (7, day7)):
+        path = os.path.join(INPUTS_DIR, DAY_INPUT_TEMPLATE.format(day_num))
+        if os.path.exists(path):
+            image = load_program_image(path)
+            workloads.append(workload(image.as_list()))
+            image.close()
+
+    return workloads
@@ -1,6 +1,6 @@
 from math import floor
 
-from aoc_util.input import get_input
+from aoc_util.input import read_ints
 from aoc_util.decorators import aoc_output_formatter
 
 #------------------------------------------------------------------------------
@@ -46,7 +46,7 @@ def part_two(problem_input):
 if __name__ == '__main__':
 
     # Transform the input into ints representing the mass of each module.
-    module_masses = [int(line) for line in get_input()]
+    module_masses = read_ints().tolist()
 
     part_one(module_masses)
     part_two(module_masses)
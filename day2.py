@@ -1,5 +1,6 @@
-from aoc_util.input import get_tokenized_input
+from aoc_util.input import get_program_image
 from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_symbolic import SymbolicIntcodeComputer, SymbolicEvaluationFailed, solve
 from aoc_util.iter import nested_iterable
 from aoc_util.decorators import aoc_output_formatter
 
@@ -27,17 +28,38 @@ def part_two(problem_input):
     # We're looking to override the values with position 1 with 'noun' and
     # position 2 with 'verb' such that the program output (the value in
     # position 0 when the program halts) is 19690720
-    for noun, verb in nested_iterable(range(100), range(100)):
 
-        # Copy the original program
-        # Set the values at positions 1 and 2 with `noun` and `verb`
-        computer = IntcodeComputer()
+    # Try running the program once with `noun` and `verb` as symbols, and
+    # solving the resulting expression for position 0 directly. If the program
+    # can't be evaluated symbolically, fall back to trying every pair.
+    try:
+        computer = SymbolicIntcodeComputer({1: 'noun', 2: 'verb'})
+        expression = computer.evaluate(problem_input, 0)
+    except SymbolicEvaluationFailed:
+        pass
+    else:
+        solution = solve(expression, 19690720, {'noun': range(100), 'verb': range(100)})
+        if solution:
+            return (100 * solution['noun']) + solution['verb']
+        return None
+
+    noun_verb_pairs = list(nested_iterable(range(100), range(100)))
+
+    # Copy the original program for every pair
+    # Set the values at positions 1 and 2 with `noun` and `verb`
+    programs = list()
+    for noun, verb in noun_verb_pairs:
         program = [i for i in problem_input]
         program[1] = noun
         program[2] = verb
+        programs.append(program)
 
-        computer.execute(program)
+    # Run every copy of the program side by side, in lock-step. The batch
+    # computer needs numpy, which is only needed here, so it's imported here
+    from aoc_util.intcode_batch import BatchIntcodeComputer
+    computers = BatchIntcodeComputer().execute(programs)
 
+    for (noun, verb), computer in zip(noun_verb_pairs, computers):
         if computer.program[0] == 19690720:
             return (100 * noun) + verb
 
@@ -46,7 +68,7 @@ def part_two(problem_input):
 if __name__ == '__main__':
 
     # Transform the input into a list of ints which define the Intcode program
-    program = get_tokenized_input(',', lambda t: int(t))[0]
+    program = get_program_image().as_list()
 
     part_one(program)
     part_two(program)
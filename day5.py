@@ -1,4 +1,4 @@
-from aoc_util.input import get_tokenized_input
+from aoc_util.input import get_program_image
 from aoc_util.intcode import IntcodeComputer
 from aoc_util.decorators import aoc_output_formatter
 
@@ -34,7 +34,7 @@ def part_two(program):
 if __name__ == '__main__':
 
     # Transform the input into a list of ints which define the Intcode program
-    program = get_tokenized_input(',', lambda t: int(t))[0]
+    program = get_program_image().as_list()
 
     # Copy the program before passing to the computers, so we're not modifying
     # values during part one that break the program in part two.
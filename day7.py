@@ -1,5 +1,7 @@
-from aoc_util.input import get_tokenized_input
-from aoc_util.intcode import IntcodeComputer, InputNotAvailableException
+from aoc_util.input import get_program_image
+from aoc_util.intcode import IntcodeRunCache
+from aoc_util.intcode_async import AsyncIntcodeComputer, connect, run_network
+from aoc_util.intcode_parallel import sweep_phase_sequences
 from aoc_util.decorators import aoc_output_formatter
 
 from itertools import permutations
@@ -8,72 +10,97 @@ from itertools import permutations
 
 copy = lambda program: [x for x in program]
 
-# -----------------------------------------------------------------------------
+# Results of each amplifier stage for the program currently being swept
+__stages = None
 
-@aoc_output_formatter(2019, 7, 1, 'max thruster signal')
-def part_one(input_program):
+def run_amplifier_chain(program, phase_sequence):
+    """ Runs the program on a chain of amplifiers, one per phase setting, each
+    feeding its output signal into the next. Returns the final signal. """
 
-    max_output_signal = 0
-    for phase_sequence in permutations(range(5)):
+    # Each stage is a pure function of its phase setting and input signal, so
+    # sequences which share a prefix only need to compute that prefix once.
+    global __stages
+    if __stages is None or __stages.program != program:
+        __stages = IntcodeRunCache(program)
 
-        signal = 0
+    signal = 0
 
-        for n in range(5):
-            inputs = [phase_sequence[n], signal]
+    for phase in phase_sequence:
+        signal = __stages.run(phase, signal)[0]
 
-            computer = IntcodeComputer()
-            computer.execute(copy(input_program), program_input=inputs)
+    return signal
 
-            signal = computer.get_output()
 
-        if signal > max_output_signal:
-            max_output_signal = signal
+# The program currently being swept, and a snapshot of it at its first input
+__snapshot_program = None
+__snapshot = None
 
-    return max_output_signal
+def first_input_snapshot(program):
+    """ Returns a snapshot of the program at its first input. Every phase
+    sequence starts the same way, so the snapshot is only taken once per
+    program, and forked for each sequence. """
 
+    global __snapshot_program, __snapshot
+    if __snapshot is None or __snapshot_program != program:
+        __snapshot = AsyncIntcodeComputer().snapshot_at_first_input(program)
+        __snapshot_program = copy(program)
 
-@aoc_output_formatter(2019, 7, 2, 'max thruster signal')
-def part_two(input_program):
+    return __snapshot
+
+
+def run_feedback_loop(program, phase_sequence):
+    """ Runs the program on a loop of amplifiers, one per phase setting, with
+    the last amplifier feeding back into the first, until the last amplifier
+    halts. Returns the final signal. """
+
+    snapshot = first_input_snapshot(program)
+
+    # Wire each amplifier's output to the next amplifier's input, and the last
+    # amplifier's output back around to the first amplifier's input
+    amps = [snapshot.fork() for _ in phase_sequence]
+    connect(amps, loop_back=True)
 
-    max_output_signal = 0
+    # The first input to each amplifier is its phase setting, after that
+    # it's just the signal from the previous amplifier
+    for amp, phase in zip(amps, phase_sequence):
+        amp.input_channel.put_nowait(phase)
+    amps[0].input_channel.put_nowait(0)
 
-    for phase_sequence in permutations([9,8,7,6,5]):
+    run_network(amps)
 
-        signal = 0
-        amps = [IntcodeComputer() for _ in range(5)]
+    # The last amplifier's final signal is left waiting for the first one
+    return amps[0].input_channel.get_nowait()
 
-        complete = False
-        while not complete:
-            for n in range(5):
-                computer = amps[n]
+# -----------------------------------------------------------------------------
+
+@aoc_output_formatter(2019, 7, 1, 'max thruster signal')
+def part_one(input_program):
+
+    # Try every phase sequence, spread across all available cores
+    max_output_signal, _ = sweep_phase_sequences(input_program,
+                                                 permutations(range(5)),
+                                                 run_amplifier_chain)
 
-                try:
-                    if computer.state == IntcodeComputer.STATE_WAITING:
-                        inputs = [signal]
-                    else:
-                        inputs = [phase_sequence[n], signal]
-                    computer.execute(copy(input_program), program_input=inputs)
-                except InputNotAvailableException:
-                    signal = computer.get_output()
-                    continue
-                else:
-                    signal = computer.get_output()
-                    if n == 4:
-                        complete = True
+    return max(max_output_signal, 0)
+
+
+@aoc_output_formatter(2019, 7, 2, 'max thruster signal')
+def part_two(input_program):
 
-        if signal > max_output_signal:
-            max_output_signal = signal
+    max_output_signal, _ = sweep_phase_sequences(input_program,
+                                                 permutations([9,8,7,6,5]),
+                                                 run_feedback_loop)
 
-    return max_output_signal
+    return max(max_output_signal, 0)
 
 # -----------------------------------------------------------------------------
 
 if __name__ == '__main__':
 
     # Transform the input into a list of ints which define the Intcode program
-    program = get_tokenized_input(',', lambda t: int(t))[0]
+    program = get_program_image().as_list()
 
     # Copy the program before passing to the computers, so we're not modifying
     # values during part one that break the program in part two.
     part_one(copy(program))
-    part_two(copy(program))
\ No newline at end of file
+    part_two(copy(program))
@@ -1,4 +1,4 @@
-from aoc_util.input import get_input
+from aoc_util.input import read_digits
 from aoc_util.iter import nested_iterable
 from aoc_util.decorators import aoc_output_formatter
 
@@ -118,7 +118,7 @@ def part_two(pixels):
 
 if __name__ == '__main__':
 
-    problem_input = [int(c) for c in get_input()[0]]
+    problem_input = read_digits().tolist()
 
     part_one(problem_input)
     part_two(problem_input)
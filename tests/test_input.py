@@ -0,0 +1,124 @@
+import pytest
+
+from aoc_util.input import iter_input_lines, iter_input_tokens, read_digits, read_ints, use_input_file
+
+np = pytest.importorskip('numpy')
+
+#------------------------------------------------------------------------------
+
+TEXTS = [
+    '',
+    '\n',
+    '1,2,3',
+    '1,2,3\n',
+    '1,2,3\n\n4,5,6\n-7,8,9\n',
+    '12,,345,\n,6\n\n\n78,9,',
+    '1,,,2,,,,3\n,,4,,\n',
+]
+
+SEPARATORS = [',', ',,', ', ']
+
+#------------------------------------------------------------------------------
+
+@pytest.fixture
+def input_file(tmp_path):
+    """ Returns a function which makes the text the input for the current AoC
+    day, in a file in a temporary directory. """
+
+    def set_input(text):
+        path = tmp_path / 'input.txt'
+        path.write_text(text)
+        use_input_file(str(path))
+
+    yield set_input
+
+    use_input_file(None)
+
+
+def chunk_sizes(text):
+    """ Every chunk size which cuts the text somewhere different, and one
+    bigger than all of it. """
+
+    return range(1, len(text) + 2)
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_iter_input_lines_matches_split(input_file, text):
+    """ Lines streamed a chunk at a time are the lines of the whole text. """
+
+    input_file(text)
+
+    # A newline at the very end doesn't start another line
+    expected = text.split('\n') if text else []
+    if text.endswith('\n'):
+        expected.pop()
+
+    for chunk_size in chunk_sizes(text):
+        assert list(iter_input_lines(chunk_size)) == expected
+
+
+@pytest.mark.parametrize('separator', SEPARATORS)
+@pytest.mark.parametrize('text', TEXTS)
+def test_iter_input_tokens_matches_split(input_file, text, separator):
+    """ Tokens streamed a chunk at a time are the tokens of the whole text,
+    however the chunks cut it, and for a separator which overlaps itself. """
+
+    text = text.replace(',', separator)
+    input_file(text)
+
+    expected = [token for line in text.split('\n') if line for token in line.split(separator)]
+
+    for chunk_size in chunk_sizes(text):
+        assert list(iter_input_tokens(separator, chunk_size=chunk_size)) == expected
+
+#------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('separator', [',', ', '])
+@pytest.mark.parametrize('text', ['', '1,2,3', '1,2,3\n4,-5,6\n\n7,8,9\n', '9223372036854775807,-9223372036854775808'])
+def test_read_ints_matches_int(input_file, text, separator):
+    """ Integers parsed in bulk, a chunk at a time, are the ints of every
+    token in the text. """
+
+    text = text.replace(',', separator)
+    input_file(text)
+
+    expected = [int(token) for token in text.replace(separator, ' ').split()]
+
+    for chunk_size in chunk_sizes(text):
+        values = read_ints(separator, use_cache=False, chunk_size=chunk_size)
+        assert values.dtype == np.int64
+        assert values.tolist() == expected
+
+    # And again through the parsed input cache, which is written then read
+    assert read_ints(separator).tolist() == expected
+    assert read_ints(separator).tolist() == expected
+
+
+@pytest.mark.parametrize('text', ['9223372036854775808', '1,-9223372036854775809', '1,2,x'])
+def test_read_ints_rejects_bad_input(input_file, text):
+    """ Anything read_ints() can't hold exactly raises, rather than being
+    clamped or cut short. """
+
+    input_file(text)
+
+    with pytest.raises((OverflowError, ValueError)):
+        read_ints(use_cache=False)
+
+
+@pytest.mark.parametrize('text', ['', '0123456789', '12 34\n56\r\n7\n'])
+def test_read_digits_matches_int(input_file, text):
+    """ Digits read in bulk are the digits of the text, whitespace skipped. """
+
+    input_file(text)
+
+    expected = [int(c) for c in text if not c.isspace()]
+
+    assert read_digits(use_cache=False).tolist() == expected
+    assert read_digits().tolist() == expected
+
+
+def test_read_digits_rejects_anything_else(input_file):
+    input_file('123/456')
+
+    with pytest.raises(ValueError):
+        read_digits(use_cache=False)
@@ -0,0 +1,23 @@
+from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_batch import BatchIntcodeComputer
+
+#------------------------------------------------------------------------------
+
+def test_mult_overflow_matches_scalar_engine():
+    """ A product just past the int64 range, which a float64 magnitude check
+    rounds back inside it, must be handed to the scalar engine rather than
+    wrapped. """
+
+    programs = [
+        [1102, 89547301328687144, 103, 0, 99],
+        [1102, -1, -2 ** 63, 0, 99],
+        [1102, 2 ** 62, -2, 0, 99],
+        [1102, 3, 5, 0, 99],
+    ]
+
+    results = BatchIntcodeComputer().execute([program[:] for program in programs])
+
+    for program, result in zip(programs, results):
+        computer = IntcodeComputer()
+        computer.execute(program[:])
+        assert result.program[0] == computer.program[0]
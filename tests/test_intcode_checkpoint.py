@@ -0,0 +1,68 @@
+import pytest
+
+from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_checkpoint import (CheckpointFormatError, IntcodeCheckpointer, load_checkpoint,
+                                         read_checkpoint, write_checkpoint)
+
+#------------------------------------------------------------------------------
+
+# Counts cell 20 up to 3000, outputs it and halts
+COUNTER = [1101, 0, 0, 20, 1001, 20, 1, 20, 1007, 20, 3000, 21, 1005, 21, 4, 4, 20, 99] + [0] * 10
+
+
+def run_to_end(computer):
+    """ Runs a computer to the end, returning its output and memory. """
+
+    computer.execute(None)
+    return list(computer.output_buffer), list(computer.program)
+
+
+def test_saving_to_the_same_path_twice_loads(tmp_path):
+    """ A second save to the same path can't be relative to itself. """
+
+    expected = IntcodeComputer()
+    expected.execute(COUNTER[:])
+
+    computer = IntcodeComputer()
+    computer.execute(COUNTER[:], max_instructions=100)
+
+    checkpointer = IntcodeCheckpointer(page_size=4)
+    path = str(tmp_path / 'same.ckpt')
+    checkpointer.save(computer, path)
+    computer.execute(None, max_instructions=100)
+    checkpointer.save(computer, path)
+
+    assert run_to_end(load_checkpoint(path)) == (list(expected.output_buffer), list(expected.program))
+
+
+def test_reusing_a_path_in_the_chain_saves_a_full_checkpoint(tmp_path):
+    """ Rotating between two paths overwrites a checkpoint further up the
+    chain, so it has to start a new chain. """
+
+    computer = IntcodeComputer()
+    computer.execute(COUNTER[:], max_instructions=100)
+
+    checkpointer = IntcodeCheckpointer(page_size=4)
+    for i in range(5):
+        path = str(tmp_path / 'rotating.{}'.format(i % 2))
+        checkpointer.save(computer, path)
+        computer.execute(None, max_instructions=100)
+
+        restored = load_checkpoint(path)
+        assert restored.instruction_ptr == read_checkpoint(path)[0][6]
+
+
+def test_a_chain_which_loops_raises(tmp_path):
+    """ A checkpoint written relative to itself is a format error, rather
+    than recursing forever. """
+
+    computer = IntcodeComputer()
+    computer.execute(COUNTER[:], max_instructions=100)
+
+    path = str(tmp_path / 'loop.ckpt')
+    memory = write_checkpoint(path, computer, 4)
+    computer.execute(None, max_instructions=100)
+    write_checkpoint(path, computer, 4, parent=(path, memory))
+
+    with pytest.raises(CheckpointFormatError):
+        load_checkpoint(path)
@@ -0,0 +1,182 @@
+import io
+
+import pytest
+
+from aoc_util import intcode_trace
+from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_batch import BatchIntcodeComputer
+from aoc_util.intcode_checkpoint import IntcodeCheckpointer, load_checkpoint
+from aoc_util.intcode_compiler import CompiledIntcodeComputer
+from aoc_util.intcode_memory import ArrayMemory, ListMemory
+from aoc_util.intcode_trace import IntcodeTrace, IntcodeTraceRecorder, TracingIntcodeComputer
+
+#------------------------------------------------------------------------------
+
+# Adds 1, 2, 3, 4 and 5 to cell 23 by rewriting the immediate of its own ADD
+# (cell 6) after every pass through the loop, then outputs 15
+REWRITE_LOOP = [1101, 0, 5, 22,
+                1001, 23, 1, 23,
+                1001, 6, 1, 6,
+                1001, 22, -1, 22,
+                1005, 22, 4,
+                4, 23,
+                99, 0, 0]
+
+# Turns the ADD straight after it into a MULT, which stores 1 * 4 and outputs it
+REWRITE_NEXT = [1101, 1, 1, 4, 1, 2, 3, 11, 4, 11, 99, 0]
+
+# Counts cell 29 down from 5, adding 1 to cell 30 on each pass. The decrement
+# and the jump after it fuse into one instruction, and once the count reaches
+# 3 the jump's target (cell 25) is rewritten to skip the addition, so this
+# outputs 3. A fused instruction which outlived the write would output 5.
+REWRITE_FUSED_JUMP = [1101, 0, 5, 29,
+                      1001, 30, 1, 30,
+                      1008, 29, 3, 31,
+                      1006, 31, 19,
+                      1101, 0, 8, 25,
+                      1001, 29, -1, 29,
+                      1005, 29, 4,
+                      4, 30,
+                      99, 0, 0, 0]
+
+# Outputs 999, 1000 or 1001 as its input is below, equal to or above 8
+COMPARE_TO_8 = [3, 21, 1008, 21, 8, 20, 1005, 20, 22, 107, 8, 21, 20, 1006, 20, 31, 1106, 0, 36,
+                98, 0, 0, 1002, 21, 125, 20, 4, 20, 1105, 1, 46, 104, 999, 1105, 1, 46, 1101, 1000,
+                1, 20, 4, 20, 1105, 1, 46, 98, 99]
+
+# Doubles cell 19 seventy times, past what an int64 can hold, then outputs it
+DOUBLE_PAST_INT64 = [1101, 0, 70, 18,
+                     1002, 19, 2, 19,
+                     1001, 18, -1, 18,
+                     1005, 18, 4,
+                     4, 19,
+                     99, 0, 3]
+
+PROGRAMS = [
+    (REWRITE_LOOP, []),
+    (REWRITE_NEXT, []),
+    (REWRITE_FUSED_JUMP, []),
+    (COMPARE_TO_8, [7]),
+    (COMPARE_TO_8, [8]),
+    (COMPARE_TO_8, [9]),
+    (DOUBLE_PAST_INT64, []),
+]
+
+#------------------------------------------------------------------------------
+
+class PlainIntcodeComputer(IntcodeComputer):
+    """ The interpreter with nothing but one instruction at a time, which
+    every other engine has to agree with. """
+
+    FUSE_INSTRUCTIONS = False
+
+
+def run_to_end(computer, program=None, program_input=None):
+    """ Runs a computer to the end, returning its output and memory. """
+
+    computer.execute(program, program_input=program_input)
+    return list(computer.output_buffer), list(computer.program)
+
+
+def expected_result(program, program_input):
+    return run_to_end(PlainIntcodeComputer(), program[:], program_input)
+
+
+ENGINES = {
+    'fused':          lambda: IntcodeComputer(),
+    'array':          lambda: IntcodeComputer(ArrayMemory),
+    'compiled':       lambda: CompiledIntcodeComputer(),
+    'compiled-array': lambda: CompiledIntcodeComputer(ArrayMemory),
+    'tracing':        lambda: TracingIntcodeComputer(IntcodeTraceRecorder(io.BytesIO())),
+}
+
+#------------------------------------------------------------------------------
+
+def test_expected_results():
+    """ The programs below do what they say they do. """
+
+    assert expected_result(REWRITE_LOOP, [])[0] == [15]
+    assert expected_result(REWRITE_NEXT, [])[0] == [4]
+    assert expected_result(REWRITE_FUSED_JUMP, [])[0] == [3]
+    assert expected_result(DOUBLE_PAST_INT64, [])[0] == [3 * 2 ** 70]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('program, program_input', PROGRAMS)
+def test_engine_matches_interpreter(engine, program, program_input):
+    """ Self-modifying writes drop whatever was decoded, fused or compiled
+    from the memory they write to, on every engine. """
+
+    expected = expected_result(program, program_input)
+
+    # Twice on one computer, so the second run starts with whatever the first
+    # left cached (and on a new computer, whatever is shared between them)
+    computer = ENGINES[engine]()
+    assert run_to_end(computer, program[:], program_input) == expected
+
+    computer.reset(program, program_input)
+    assert run_to_end(computer) == expected
+
+
+def test_batch_matches_interpreter():
+    """ Lanes which write over their code, or overflow an int64, finish with
+    the same results as the interpreter. """
+
+    programs = [program for program, program_input in PROGRAMS]
+    inputs = [program_input for program, program_input in PROGRAMS]
+
+    # The batch computer runs copies of one program, so each is batched alone
+    for program, program_input in zip(programs, inputs):
+        [computer] = BatchIntcodeComputer().execute([program[:]], [program_input])
+        assert (list(computer.output_buffer), list(computer.program)) == expected_result(program, program_input)
+
+#------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('program, program_input', PROGRAMS)
+def test_trace_state_at_replays_the_run(monkeypatch, program, program_input):
+    """ The state rebuilt at every step of a trace runs on to the same end as
+    the run which was recorded, from a keyframe or between two. """
+
+    monkeypatch.setattr(intcode_trace, 'KEYFRAME_INTERVAL', 8)
+
+    expected = expected_result(program, program_input)
+
+    file = io.BytesIO()
+    computer = TracingIntcodeComputer(IntcodeTraceRecorder(file))
+    assert run_to_end(computer, program[:], program_input) == expected
+
+    trace = IntcodeTrace(file.getvalue())
+    assert trace.outputs == expected[0]
+    assert trace.state_at(0).program == program
+
+    for step in range(len(trace)):
+        assert run_to_end(trace.state_at(step)) == expected
+
+#------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('memory_backend', [ListMemory, ArrayMemory])
+@pytest.mark.parametrize('program, program_input', PROGRAMS)
+def test_incremental_checkpoints_round_trip(tmp_path, memory_backend, program, program_input):
+    """ Every checkpoint in a chain of incremental checkpoints, including ones
+    saved after memory outgrew an int64 array, restores a computer which runs
+    on to the same end as the original. """
+
+    expected = expected_result(program, program_input)
+
+    computer = IntcodeComputer(memory_backend)
+    computer.execute(program[:], program_input=program_input, max_instructions=1)
+
+    checkpointer = IntcodeCheckpointer(page_size=4, full_every=3)
+    while computer.state == IntcodeComputer.STATE_SUSPENDED:
+        path = str(tmp_path / 'run.ckpt.{}'.format(checkpointer.saved))
+        checkpointer.save(computer, path)
+
+        restored = load_checkpoint(path)
+        assert restored.instruction_ptr == computer.instruction_ptr
+        assert list(restored.program) == list(computer.program)
+        assert run_to_end(restored) == expected
+
+        computer.execute(None, max_instructions=1)
+
+    assert checkpointer.saved > 1
+    assert (list(computer.output_buffer), list(computer.program)) == expected
@@ -0,0 +1,47 @@
+from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_pool import IntcodeComputerPool
+
+#------------------------------------------------------------------------------
+
+# Outputs the sum of two inputs
+ADD_INPUTS = [3, 11, 3, 12, 1, 11, 12, 13, 4, 13, 99, 0, 0, 0]
+
+
+def test_reset_reuses_the_computers_own_ports():
+    """ A reset computer empties its own ports rather than making new ones. """
+
+    computer = IntcodeComputer()
+    program_input, output_buffer = computer.program_input, computer.output_buffer
+
+    for a, b in ((1, 2), (30, 40)):
+        computer.reset(ADD_INPUTS, [a, b])
+        computer.execute(None)
+        assert list(computer.output_buffer) == [a + b]
+
+    assert computer.program_input is program_input
+    assert computer.output_buffer is output_buffer
+
+
+def test_reset_leaves_wired_ports_alone():
+    """ Resetting a computer whose output was wired to another computer's
+    input doesn't empty or keep writing to the other computer's input. """
+
+    first, second = IntcodeComputer(), IntcodeComputer()
+    first.output_buffer = second.program_input
+    first.reset(ADD_INPUTS, [1, 2])
+    second.program_input.write(5)
+
+    first.execute(None)
+    assert list(second.program_input) == [5]
+    assert list(first.output_buffer) == [3]
+
+
+def test_pooled_computers_run_independently():
+    """ Computers handed out by a pool give the same results as new ones. """
+
+    pool = IntcodeComputerPool()
+    for a, b in ((1, 2), (3, 4), (5, 6)):
+        with pool.computer() as computer:
+            computer.reset(ADD_INPUTS, [a, b])
+            computer.execute(None)
+            assert computer.get_output() == a + b
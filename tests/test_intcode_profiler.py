@@ -0,0 +1,42 @@
+from aoc_util.intcode import IntcodeComputer
+
+#------------------------------------------------------------------------------
+
+# Counts cell 20 down from 5, with an ADD and the JIT testing it, which the
+# interpreter fuses into one superinstruction
+COUNTDOWN = [1101, 0, 5, 20, 1001, 20, -1, 20, 1005, 20, 4, 99] + [0] * 10
+
+
+def profile_countdown(fuse):
+    """ Profiles the countdown, with or without fusion allowed. """
+
+    computer = IntcodeComputer()
+    computer.FUSE_INSTRUCTIONS = fuse
+    profile = computer.enable_profiling()
+    computer.execute(COUNTDOWN[:])
+
+    return profile
+
+
+def test_profiling_counts_fused_instructions_separately():
+    """ A profile is the same whether or not fusion is allowed, with every
+    instruction counted under its own opcode and address. """
+
+    fused, unfused = profile_countdown(True), profile_countdown(False)
+
+    assert fused.opcode_counts() == unfused.opcode_counts()
+    assert fused.address_counts() == unfused.address_counts()
+    assert fused.opcode_counts()[IntcodeComputer.OPCODE_JIT] == 5
+
+
+def test_fusion_resumes_when_profiling_stops():
+    """ Once profiling is disabled, instructions are fused again. """
+
+    computer = IntcodeComputer()
+    computer.enable_profiling()
+    computer.execute(COUNTDOWN[:])
+    computer.disable_profiling()
+
+    computer.reset(COUNTDOWN)
+    computer.execute(None)
+    assert computer.decode_cache[4][0] == IntcodeComputer.OPCODE_ADD_JUMP
@@ -0,0 +1,28 @@
+from aoc_util.intcode import IntcodeComputer
+from aoc_util.intcode_compiler import CompiledIntcodeComputer
+from aoc_util.intcode_scheduler import IntcodeScheduler
+
+#------------------------------------------------------------------------------
+
+# Reads a value and outputs one more than it, twice, then halts
+ADD_ONE_TWICE = [3, 20, 1001, 20, 1, 20, 4, 20,
+                 3, 20, 1001, 20, 1, 20, 4, 20,
+                 99] + [0] * 4
+
+
+def test_adding_with_a_program_keeps_wired_ports():
+    """ Two computers wired into a loop before being added with their program
+    pass a value back and forth until they halt. """
+
+    for computer_class in (IntcodeComputer, CompiledIntcodeComputer):
+        first, second = computer_class(), computer_class()
+        first.output_buffer = second.program_input
+        second.output_buffer = first.program_input
+        first.program_input.write(1)
+
+        scheduler = IntcodeScheduler(quantum=3)
+        scheduler.add(first, ADD_ONE_TWICE)
+        scheduler.add(second, ADD_ONE_TWICE)
+
+        assert scheduler.run()
+        assert list(first.program_input) == [5]